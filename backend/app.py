@@ -2,23 +2,34 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener
 import os
+import queue
 from dotenv import load_dotenv
 from datetime import datetime
+from utils.json_provider import OrjsonProvider
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configure logging: request threads only enqueue records and a background
+# listener performs the blocking stream writes
+log_queue = queue.SimpleQueue()
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(
+    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 )
+log_listener = QueueListener(log_queue, log_stream_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(log_queue)])
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Configuration
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
@@ -55,7 +66,7 @@ app.register_blueprint(data_bp)   # Data routes handle their own URL prefixes
 @app.before_request
 def log_request():
     """Log incoming requests"""
-    logger.info(f"{request.method} {request.path} - IP: {get_remote_address()}")
+    logger.info("%s %s - IP: %s", request.method, request.path, get_remote_address())
 
 @app.errorhandler(400)
 def bad_request(error):
@@ -63,7 +74,7 @@ def bad_request(error):
 
 @app.errorhandler(500)
 def internal_error(error):
-    logger.error(f"Internal error: {str(error)}")
+    logger.error("Internal error: %s", error)
     return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/health', methods=['GET'])
@@ -3,16 +3,53 @@ Database Configuration and Connection Module
 Handles MySQL database connections and operations for medical reports
 """
 
-import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, IntegrityError, errorcode, pooling
 import os
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 import uuid
+import hashlib
+import secrets
 import json
+import zlib
+import logging
+import threading
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+class DuplicateEntryError(Exception):
+    """Raised when an insert collides with an existing UNIQUE key"""
+
+
+# Shared connection pool, created on first use so importing this module
+# never opens a socket
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide MySQL connection pool, creating it if needed"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = pooling.MySQLConnectionPool(
+                pool_name="healthforge",
+                pool_size=int(os.getenv("MYSQL_POOL_SIZE", 25)),
+                # Resetting the session on checkout would deallocate the prepared
+                # statements; the app keeps no other per-session state
+                pool_reset_session=False,
+                host=os.getenv("MYSQL_HOST", "localhost"),
+                port=int(os.getenv("MYSQL_PORT", 3306)),
+                user=os.getenv("MYSQL_USER", "root"),
+                password=os.getenv("MYSQL_PASSWORD", ""),
+                database=os.getenv("MYSQL_DATABASE", "medical_reports_db"),
+                use_pure=False  # C extension parses result packets natively
+            )
+        return _pool
+
 
 class DatabaseConnection:
     """MySQL Database Connection Handler"""
@@ -26,33 +63,136 @@ class DatabaseConnection:
         self.connection = None
     
     def connect(self):
-        """Establish database connection"""
+        """Borrow a connection from the shared pool"""
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
+            self.connection = get_pool().get_connection()
             if self.connection.is_connected():
-                print("Successfully connected to MySQL database")
                 return True
-        except Error as e:
-            print(f"Error connecting to MySQL: {e}")
+        except Error:
+            logger.exception("Error connecting to MySQL")
             return False
     
     def disconnect(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
+        """Return the connection to the pool"""
+        if self.connection:
+            # The pool does not reset sessions, so end any open transaction
+            # (including a read-only snapshot) before handing the connection on
+            if self.connection.in_transaction and self.connection.is_connected():
+                self.connection.rollback()
             self.connection.close()
-            print("MySQL connection closed")
+            self.connection = None
     
     def get_connection(self):
         """Get active connection, reconnect if needed"""
         if not self.connection or not self.connection.is_connected():
+            self.disconnect()
             self.connect()
         return self.connection
+    
+    def prepared_cursor(self, query: str):
+        """
+        Get a server-side prepared dictionary cursor for query
+        
+        The cursor stays bound to the physical connection, so later checkouts
+        of the same pooled connection execute without re-parsing the SQL.
+        Callers must fetch all rows and must not close the cursor.
+        """
+        conn = self.get_connection()
+        
+        # Cursors are cached on the physical connection behind the pool
+        # wrapper, so they are freed with it. A reconnect starts a new server
+        # session (new connection id), whose statements must be prepared again.
+        cnx = getattr(conn, '_cnx', conn)
+        session_id, cursors = getattr(cnx, '_app_prepared_cursors', (None, None))
+        if session_id != conn.connection_id:
+            cursors = {}
+            cnx._app_prepared_cursors = (conn.connection_id, cursors)
+        
+        cursor = cursors.get(query)
+        if cursor is None:
+            cursor = conn.cursor(prepared=True, dictionary=True)
+            cursors[query] = cursor
+        return cursor
+
+
+INSERT_REPORT_QUERY = """
+    INSERT INTO medical_reports (
+        report_id, file_name, patient_name, patient_age, patient_gender,
+        patient_id, report_date, report_type, hospital_name, doctor_name,
+        summary, diagnosis, key_findings, test_results, recommendations,
+        raw_text, processed_status, faiss_index_path
+    ) VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    )
+"""
+
+# executemany() rewrites this into one multi-row INSERT
+INSERT_TEST_RESULT_QUERY = """
+    INSERT INTO test_results (
+        report_id, test_name, test_value, unit, normal_range, status
+    ) VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+
+def compress_text(text: str) -> bytes:
+    """Compress report text for the raw_text BLOB column"""
+    return zlib.compress(text.encode('utf-8'), 6) if text else None
+
+
+def decompress_text(value) -> str:
+    """Inverse of compress_text; rows stored before compression hold plain UTF-8"""
+    if value is None or isinstance(value, str):
+        return value
+    try:
+        return zlib.decompress(value).decode('utf-8')
+    except zlib.error:
+        return bytes(value).decode('utf-8', 'replace')
+
+
+def decode_report(row: dict) -> dict:
+    """Decompress the raw_text column of a medical_reports row in place"""
+    if row and 'raw_text' in row:
+        row['raw_text'] = decompress_text(row['raw_text'])
+    return row
+
+
+def report_row(report_id: str, report_data: dict) -> tuple:
+    """Parameters for INSERT_REPORT_QUERY"""
+    return (
+        report_id,
+        report_data.get('file_name', ''),
+        report_data.get('patient_name'),
+        report_data.get('patient_age'),
+        report_data.get('patient_gender', 'Unknown'),
+        report_data.get('patient_id'),
+        report_data.get('report_date'),
+        report_data.get('report_type'),
+        report_data.get('hospital_name'),
+        report_data.get('doctor_name'),
+        report_data.get('summary'),
+        report_data.get('diagnosis'),
+        report_data.get('key_findings'),
+        json.dumps(report_data.get('test_results', {})),
+        report_data.get('recommendations'),
+        compress_text(report_data.get('raw_text')),
+        'processed',
+        report_data.get('faiss_index_path', 'faiss_index')
+    )
+
+
+def test_result_rows(report_id: str, test_results: list) -> list:
+    """Parameters for INSERT_TEST_RESULT_QUERY, one tuple per test"""
+    return [
+        (
+            report_id,
+            test.get('test_name'),
+            test.get('test_value'),
+            test.get('unit'),
+            test.get('normal_range'),
+            test.get('status', 'Unknown')
+        )
+        for test in test_results
+    ]
 
 
 class MedicalReportDB:
@@ -64,7 +204,7 @@ class MedicalReportDB:
     def generate_report_id(self):
         """Generate unique report ID"""
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        unique_id = str(uuid.uuid4())[:8].upper()
+        unique_id = secrets.token_hex(4).upper()
         return f"RPT-{timestamp}-{unique_id}"
     
     def save_report(self, report_data: dict) -> str:
@@ -74,6 +214,66 @@ class MedicalReportDB:
         Parameters:
         - report_data: Dictionary containing report information
         
+        Returns:
+        - report_id: The unique ID assigned to the report
+        """
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            
+            report_id = self.generate_report_id()
+            
+            cursor.execute(INSERT_REPORT_QUERY, report_row(report_id, report_data))
+            conn.commit()
+            
+            logger.info("Report saved successfully with ID: %s", report_id)
+            return report_id
+            
+        except Error:
+            logger.exception("Error saving report")
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+    
+    def save_report_with_tests(self, report_data: dict, test_results: list) -> str:
+        """
+        Save a report and its individual test results in one transaction
+        
+        Parameters:
+        - report_data: Dictionary containing report information (as for save_report)
+        - test_results: List of dictionaries with test information
+        
+        Returns:
+        - report_id: The unique ID assigned to the report, None on failure
+        """
+        cursor = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            
+            report_id = self.generate_report_id()
+            
+            cursor.execute(INSERT_REPORT_QUERY, report_row(report_id, report_data))
+            if test_results:
+                cursor.executemany(INSERT_TEST_RESULT_QUERY, test_result_rows(report_id, test_results))
+            conn.commit()
+            
+            logger.info("Report saved successfully with ID: %s", report_id)
+            return report_id
+            
+        except Error:
+            logger.exception("Error saving report")
+            conn.rollback()
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+    
+    def create_pending_report(self, file_name: str, patient_id: str = None) -> str:
+        """
+        Insert a placeholder row for a report that is still being processed
+        
         Returns:
         - report_id: The unique ID assigned to the report
         """
@@ -84,19 +284,56 @@ class MedicalReportDB:
             report_id = self.generate_report_id()
             
             query = """
-                INSERT INTO medical_reports (
-                    report_id, file_name, patient_name, patient_age, patient_gender,
-                    patient_id, report_date, report_type, hospital_name, doctor_name,
-                    summary, diagnosis, key_findings, test_results, recommendations,
-                    raw_text, processed_status, faiss_index_path
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                )
+                INSERT INTO medical_reports (report_id, file_name, patient_id, processed_status)
+                VALUES (%s, %s, %s, 'pending')
+            """
+            cursor.execute(query, (report_id, file_name, patient_id))
+            conn.commit()
+            
+            return report_id
+            
+        except Error:
+            logger.exception("Error creating pending report")
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+    
+    def complete_report(self, report_id: str, report_data: dict, test_results: list = None) -> bool:
+        """
+        Fill in a pending report with its processed data and mark it processed
+        
+        Test result rows are written in the same transaction, before the
+        status flips, so a processed report never lacks its test rows.
+        
+        Parameters:
+        - report_id: ID returned by create_pending_report
+        - report_data: Dictionary containing report information (as for save_report)
+        - test_results: Optional list of dictionaries with test information
+        
+        Returns:
+        - True if the report was updated, False on failure
+        """
+        cursor = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            
+            if test_results:
+                cursor.executemany(INSERT_TEST_RESULT_QUERY, test_result_rows(report_id, test_results))
+            
+            query = """
+                UPDATE medical_reports SET
+                    patient_name = %s, patient_age = %s, patient_gender = %s,
+                    patient_id = %s, report_date = %s, report_type = %s,
+                    hospital_name = %s, doctor_name = %s, summary = %s,
+                    diagnosis = %s, key_findings = %s, test_results = %s,
+                    recommendations = %s, raw_text = %s, faiss_index_path = %s,
+                    processed_status = 'processed'
+                WHERE report_id = %s
             """
             
             values = (
-                report_id,
-                report_data.get('file_name', ''),
                 report_data.get('patient_name'),
                 report_data.get('patient_age'),
                 report_data.get('patient_gender', 'Unknown'),
@@ -110,20 +347,38 @@ class MedicalReportDB:
                 report_data.get('key_findings'),
                 json.dumps(report_data.get('test_results', {})),
                 report_data.get('recommendations'),
-                report_data.get('raw_text'),
-                'processed',
-                report_data.get('faiss_index_path', 'faiss_index')
+                compress_text(report_data.get('raw_text')),
+                report_data.get('faiss_index_path', 'faiss_index'),
+                report_id
             )
             
             cursor.execute(query, values)
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return False
             conn.commit()
+            return True
             
-            print(f"Report saved successfully with ID: {report_id}")
-            return report_id
+        except Error:
+            logger.exception("Error completing report")
+            conn.rollback()
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+    
+    def mark_report_failed(self, report_id: str):
+        """Mark a pending report as failed"""
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
             
-        except Error as e:
-            print(f"Error saving report: {e}")
-            return None
+            query = "UPDATE medical_reports SET processed_status = 'failed' WHERE report_id = %s"
+            cursor.execute(query, (report_id,))
+            conn.commit()
+            
+        except Error:
+            logger.exception("Error marking report failed")
         finally:
             if cursor:
                 cursor.close()
@@ -140,28 +395,12 @@ class MedicalReportDB:
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
-            query = """
-                INSERT INTO test_results (
-                    report_id, test_name, test_value, unit, normal_range, status
-                ) VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            
-            for test in test_results:
-                values = (
-                    report_id,
-                    test.get('test_name'),
-                    test.get('test_value'),
-                    test.get('unit'),
-                    test.get('normal_range'),
-                    test.get('status', 'Unknown')
-                )
-                cursor.execute(query, values)
-            
+            cursor.executemany(INSERT_TEST_RESULT_QUERY, test_result_rows(report_id, test_results))
             conn.commit()
-            print(f"Test results saved for report: {report_id}")
+            logger.info("Test results saved for report: %s", report_id)
             
-        except Error as e:
-            print(f"Error saving test results: {e}")
+        except Error:
+            logger.exception("Error saving test results")
         finally:
             if cursor:
                 cursor.close()
@@ -179,8 +418,8 @@ class MedicalReportDB:
             cursor.execute(query, (report_id, question, response))
             conn.commit()
             
-        except Error as e:
-            print(f"Error saving query: {e}")
+        except Error:
+            logger.exception("Error saving query")
         finally:
             if cursor:
                 cursor.close()
@@ -195,10 +434,10 @@ class MedicalReportDB:
             cursor.execute(query, (report_id,))
             result = cursor.fetchone()
             
-            return result
+            return decode_report(result)
             
-        except Error as e:
-            print(f"Error retrieving report: {e}")
+        except Error:
+            logger.exception("Error retrieving report")
             return None
         finally:
             if cursor:
@@ -222,8 +461,8 @@ class MedicalReportDB:
             
             return results
             
-        except Error as e:
-            print(f"Error retrieving reports: {e}")
+        except Error:
+            logger.exception("Error retrieving reports")
             return []
         finally:
             if cursor:
@@ -246,10 +485,53 @@ class MedicalReportDB:
             cursor.execute(query, (search_pattern, search_pattern, search_pattern))
             results = cursor.fetchall()
             
-            return results
+            return [decode_report(row) for row in results]
+            
+        except Error:
+            logger.exception("Error searching reports")
+            return []
+        finally:
+            if cursor:
+                cursor.close()
+    
+    def get_reports_by_patient_id(self, patient_id: str, limit: int = 50, after_id: int = None) -> list:
+        """
+        Get one page of reports for a patient, newest first
+        
+        Parameters:
+        - patient_id: Patient ID the reports are linked to
+        - limit: Maximum number of rows to return
+        - after_id: Keyset cursor; only rows with a smaller id are returned
+        
+        Returns:
+        - List of report rows
+        """
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            
+            if after_id is None:
+                query = """
+                    SELECT * FROM medical_reports 
+                    WHERE patient_id = %s 
+                    ORDER BY id DESC 
+                    LIMIT %s
+                """
+                cursor.execute(query, (patient_id, limit))
+            else:
+                query = """
+                    SELECT * FROM medical_reports 
+                    WHERE patient_id = %s AND id < %s 
+                    ORDER BY id DESC 
+                    LIMIT %s
+                """
+                cursor.execute(query, (patient_id, after_id, limit))
+            results = cursor.fetchall()
             
-        except Error as e:
-            print(f"Error searching reports: {e}")
+            return [decode_report(row) for row in results]
+            
+        except Error:
+            logger.exception("Error retrieving patient reports")
             return []
         finally:
             if cursor:
@@ -271,8 +553,8 @@ class MedicalReportDB:
             
             return results
             
-        except Error as e:
-            print(f"Error retrieving query history: {e}")
+        except Error:
+            logger.exception("Error retrieving query history")
             return []
         finally:
             if cursor:
@@ -290,8 +572,8 @@ class MedicalReportDB:
             
             return cursor.rowcount > 0
             
-        except Error as e:
-            print(f"Error deleting report: {e}")
+        except Error:
+            logger.exception("Error deleting report")
             return False
         finally:
             if cursor:
@@ -326,9 +608,6 @@ class UserDB:
         - patient_id if successful, None otherwise
         """
         try:
-            import uuid
-            import hashlib
-            
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
@@ -356,11 +635,11 @@ class UserDB:
             cursor.execute(query, values)
             conn.commit()
             
-            print(f"Patient registered successfully with ID: {patient_id}")
+            logger.info("Patient registered successfully with ID: %s", patient_id)
             return patient_id
             
-        except Error as e:
-            print(f"Error registering patient: {e}")
+        except Error:
+            logger.exception("Error registering patient")
             return None
         finally:
             if cursor:
@@ -369,80 +648,82 @@ class UserDB:
     def get_patient_by_email(self, email: str) -> dict:
         """Get patient by email address"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor(dictionary=True)
-            
             query = "SELECT * FROM patients WHERE email = %s AND is_active = TRUE"
+            cursor = self.db.prepared_cursor(query)
             cursor.execute(query, (email,))
-            result = cursor.fetchone()
+            rows = cursor.fetchall()
             
-            return result
+            return rows[0] if rows else None
             
-        except Error as e:
-            print(f"Error retrieving patient: {e}")
+        except Error:
+            logger.exception("Error retrieving patient")
             return None
-        finally:
-            if cursor:
-                cursor.close()
     
     def get_patient_by_id(self, patient_id: str) -> dict:
-        """Get patient by ID"""
+        """Get patient by ID; the PIN hash is never selected"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            query = "SELECT * FROM patients WHERE id = %s AND is_active = TRUE"
+            query = """
+                SELECT id, first_name, last_name, email, phone,
+                       DATE_FORMAT(date_of_birth, '%Y-%m-%d') AS date_of_birth,
+                       fingerprint_credential_id, fingerprint_public_key,
+                       fingerprint_registered,
+                       DATE_FORMAT(created_at, '%Y-%m-%d %T') AS created_at,
+                       DATE_FORMAT(updated_at, '%Y-%m-%d %T') AS updated_at,
+                       is_active
+                FROM patients
+                WHERE id = %s AND is_active = TRUE
+            """
+            cursor = self.db.prepared_cursor(query)
             cursor.execute(query, (patient_id,))
-            result = cursor.fetchone()
+            rows = cursor.fetchall()
             
-            return result
+            return rows[0] if rows else None
             
-        except Error as e:
-            print(f"Error retrieving patient: {e}")
+        except Error:
+            logger.exception("Error retrieving patient")
             return None
-        finally:
-            if cursor:
-                cursor.close()
     
     def verify_patient_pin(self, email: str, pin: str) -> dict:
         """
         Verify patient login credentials
         
         Returns:
-        - Patient data if credentials are valid, None otherwise
+        - Patient data shaped for the login response (camelCase keys,
+          dateOfBirth as YYYY-MM-DD) if credentials are valid, None otherwise
         """
         try:
-            import hashlib
-            
-            patient = self.get_patient_by_email(email)
-            if not patient:
-                return None
-            
-            # Hash the provided PIN and compare
+            # Hash the provided PIN and compare in the lookup itself
             hashed_pin = hashlib.sha256(pin.encode()).hexdigest()
             
-            if patient.get('pin') == hashed_pin:
-                # Return patient data without the PIN
-                patient.pop('pin', None)
-                return patient
+            query = """
+                SELECT id, first_name AS firstName, last_name AS lastName, email, phone,
+                       DATE_FORMAT(date_of_birth, '%Y-%m-%d') AS dateOfBirth
+                FROM patients
+                WHERE email = %s AND pin = %s AND is_active = TRUE
+            """
+            cursor = self.db.prepared_cursor(query)
+            cursor.execute(query, (email, hashed_pin))
+            rows = cursor.fetchall()
             
-            return None
+            return rows[0] if rows else None
             
-        except Exception as e:
-            print(f"Error verifying patient: {e}")
+        except Error:
+            logger.exception("Error verifying patient")
             return None
     
     def get_all_patients(self, limit: int = 100) -> list:
-        """Retrieve all active patients"""
+        """Retrieve all active patients with dates already formatted as strings"""
         try:
             conn = self.db.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             query = """
-                SELECT id, first_name, last_name, email, phone, date_of_birth, created_at
+                SELECT id, first_name, last_name, email, phone,
+                       DATE_FORMAT(date_of_birth, '%Y-%m-%d') AS date_of_birth,
+                       DATE_FORMAT(created_at, '%Y-%m-%d %T') AS created_at
                 FROM patients 
                 WHERE is_active = TRUE
-                ORDER BY created_at DESC 
+                ORDER BY patients.created_at DESC 
                 LIMIT %s
             """
             cursor.execute(query, (limit,))
@@ -450,13 +731,49 @@ class UserDB:
             
             return results
             
-        except Error as e:
-            print(f"Error retrieving patients: {e}")
+        except Error:
+            logger.exception("Error retrieving patients")
             return []
         finally:
             if cursor:
                 cursor.close()
     
+    def iter_all_patients(self, limit: int = 100, batch_size: int = 500):
+        """
+        Stream active patients from an unbuffered cursor
+        
+        Rows are pulled from the server in batches of batch_size, so memory
+        stays bounded regardless of limit. Errors are logged and re-raised
+        so callers never mistake a broken stream for a complete listing.
+        """
+        cursor = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            
+            query = """
+                SELECT id, first_name, last_name, email, phone,
+                       DATE_FORMAT(date_of_birth, '%Y-%m-%d') AS date_of_birth,
+                       DATE_FORMAT(created_at, '%Y-%m-%d %T') AS created_at
+                FROM patients 
+                WHERE is_active = TRUE
+                ORDER BY patients.created_at DESC 
+                LIMIT %s
+            """
+            cursor.execute(query, (limit,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+            
+        except Error:
+            logger.exception("Error streaming patients")
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+    
     def patient_exists(self, email: str) -> bool:
         """Check if a patient with the given email already exists"""
         patient = self.get_patient_by_email(email)
@@ -473,11 +790,11 @@ class UserDB:
         
         Returns:
         - doctor_id if successful, None otherwise
+        
+        Raises:
+        - DuplicateEntryError if the license ID is already registered
         """
         try:
-            import uuid
-            import hashlib
-            
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
@@ -504,11 +821,16 @@ class UserDB:
             cursor.execute(query, values)
             conn.commit()
             
-            print(f"Doctor registered successfully with ID: {doctor_id}")
+            logger.info("Doctor registered successfully with ID: %s", doctor_id)
             return doctor_id
             
-        except Error as e:
-            print(f"Error registering doctor: {e}")
+        except IntegrityError as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise DuplicateEntryError(doctor_data.get('licenseId')) from e
+            logger.exception("Error registering doctor")
+            return None
+        except Error:
+            logger.exception("Error registering doctor")
             return None
         finally:
             if cursor:
@@ -517,80 +839,78 @@ class UserDB:
     def get_doctor_by_license_id(self, license_id: str) -> dict:
         """Get doctor by license ID"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor(dictionary=True)
-            
             query = "SELECT * FROM doctors WHERE license_id = %s AND is_active = TRUE"
+            cursor = self.db.prepared_cursor(query)
             cursor.execute(query, (license_id,))
-            result = cursor.fetchone()
+            rows = cursor.fetchall()
             
-            return result
+            return rows[0] if rows else None
             
-        except Error as e:
-            print(f"Error retrieving doctor: {e}")
+        except Error:
+            logger.exception("Error retrieving doctor")
             return None
-        finally:
-            if cursor:
-                cursor.close()
     
     def get_doctor_by_id(self, doctor_id: str) -> dict:
-        """Get doctor by ID"""
+        """Get doctor by ID; the password hash is never selected"""
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            query = "SELECT * FROM doctors WHERE id = %s AND is_active = TRUE"
+            query = """
+                SELECT id, license_id, full_name, specialization, verified,
+                       DATE_FORMAT(created_at, '%Y-%m-%d %T') AS created_at,
+                       DATE_FORMAT(updated_at, '%Y-%m-%d %T') AS updated_at,
+                       is_active
+                FROM doctors
+                WHERE id = %s AND is_active = TRUE
+            """
+            cursor = self.db.prepared_cursor(query)
             cursor.execute(query, (doctor_id,))
-            result = cursor.fetchone()
+            rows = cursor.fetchall()
             
-            return result
+            return rows[0] if rows else None
             
-        except Error as e:
-            print(f"Error retrieving doctor: {e}")
+        except Error:
+            logger.exception("Error retrieving doctor")
             return None
-        finally:
-            if cursor:
-                cursor.close()
     
     def verify_doctor_password(self, license_id: str, password: str) -> dict:
         """
         Verify doctor login credentials
         
         Returns:
-        - Doctor data if credentials are valid, None otherwise
+        - Doctor data shaped for the login response (camelCase keys)
+          if credentials are valid, None otherwise
         """
         try:
-            import hashlib
-            
-            doctor = self.get_doctor_by_license_id(license_id)
-            if not doctor:
-                return None
-            
-            # Hash the provided password and compare
+            # Hash the provided password and compare in the lookup itself
             hashed_password = hashlib.sha256(password.encode()).hexdigest()
             
-            if doctor.get('password') == hashed_password:
-                # Return doctor data without the password
-                doctor.pop('password', None)
-                return doctor
+            query = """
+                SELECT id, license_id AS licenseId, full_name AS fullName,
+                       specialization, verified
+                FROM doctors
+                WHERE license_id = %s AND password = %s AND is_active = TRUE
+            """
+            cursor = self.db.prepared_cursor(query)
+            cursor.execute(query, (license_id, hashed_password))
+            rows = cursor.fetchall()
             
-            return None
+            return rows[0] if rows else None
             
-        except Exception as e:
-            print(f"Error verifying doctor: {e}")
+        except Error:
+            logger.exception("Error verifying doctor")
             return None
     
     def get_all_doctors(self, limit: int = 100) -> list:
-        """Retrieve all active doctors"""
+        """Retrieve all active doctors with dates already formatted as strings"""
         try:
             conn = self.db.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             query = """
-                SELECT id, license_id, full_name, specialization, verified, created_at
+                SELECT id, license_id, full_name, specialization, verified,
+                       DATE_FORMAT(created_at, '%Y-%m-%d %T') AS created_at
                 FROM doctors 
                 WHERE is_active = TRUE
-                ORDER BY created_at DESC 
+                ORDER BY doctors.created_at DESC 
                 LIMIT %s
             """
             cursor.execute(query, (limit,))
@@ -598,8 +918,8 @@ class UserDB:
             
             return results
             
-        except Error as e:
-            print(f"Error retrieving doctors: {e}")
+        except Error:
+            logger.exception("Error retrieving doctors")
             return []
         finally:
             if cursor:
@@ -622,8 +942,8 @@ class UserDB:
             
             return cursor.rowcount > 0
             
-        except Error as e:
-            print(f"Error verifying doctor: {e}")
+        except Error:
+            logger.exception("Error verifying doctor")
             return False
         finally:
             if cursor:
@@ -659,11 +979,11 @@ class UserDB:
             
             success = cursor.rowcount > 0
             if success:
-                print(f"Fingerprint registered successfully for: {email}")
+                logger.info("Fingerprint registered successfully for: %s", email)
             return success
             
-        except Error as e:
-            print(f"Error registering fingerprint: {e}")
+        except Error:
+            logger.exception("Error registering fingerprint")
             return False
         finally:
             if cursor:
@@ -696,8 +1016,8 @@ class UserDB:
                 }
             return None
             
-        except Error as e:
-            print(f"Error getting fingerprint credential: {e}")
+        except Error:
+            logger.exception("Error getting fingerprint credential")
             return None
         finally:
             if cursor:
@@ -715,7 +1035,8 @@ class UserDB:
             cursor = conn.cursor(dictionary=True)
             
             query = """
-                SELECT id, first_name, last_name, email, phone, date_of_birth, 
+                SELECT id, first_name, last_name, email, phone,
+                       DATE_FORMAT(date_of_birth, '%Y-%m-%d') AS date_of_birth,
                        fingerprint_credential_id, fingerprint_public_key
                 FROM patients 
                 WHERE email = %s AND fingerprint_credential_id = %s 
@@ -732,8 +1053,8 @@ class UserDB:
             
             return None
             
-        except Error as e:
-            print(f"Error verifying fingerprint: {e}")
+        except Error:
+            logger.exception("Error verifying fingerprint")
             return None
         finally:
             if cursor:
@@ -755,8 +1076,8 @@ class UserDB:
             
             return result and result.get('fingerprint_registered', False)
             
-        except Error as e:
-            print(f"Error checking fingerprint registration: {e}")
+        except Error:
+            logger.exception("Error checking fingerprint registration")
             return False
         finally:
             if cursor:
@@ -773,11 +1094,11 @@ class UserDB:
         
         Returns:
         - verification_id if successful, None otherwise
+        
+        Raises:
+        - DuplicateEntryError if a patient with this email already exists
         """
         try:
-            import hashlib
-            from datetime import datetime, timedelta
-            
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
@@ -793,11 +1114,15 @@ class UserDB:
             delete_query = "DELETE FROM email_verifications WHERE email = %s"
             cursor.execute(delete_query, (verification_data.get('email'),))
             
+            # Only insert when no patient owns this email yet, so the
+            # existence check costs no extra round-trip
             query = """
                 INSERT INTO email_verifications (
                     id, email, verification_code, pin, first_name, last_name, 
                     phone, date_of_birth, expires_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                )
+                SELECT %s, %s, %s, %s, %s, %s, %s, %s, %s FROM DUAL
+                WHERE NOT EXISTS (SELECT 1 FROM patients WHERE email = %s)
             """
             
             values = (
@@ -809,17 +1134,21 @@ class UserDB:
                 verification_data.get('lastName'),
                 verification_data.get('phone'),
                 verification_data.get('dateOfBirth'),
-                expires_at
+                expires_at,
+                verification_data.get('email')
             )
             
             cursor.execute(query, values)
             conn.commit()
             
-            print(f"Email verification created with ID: {verification_id}")
+            if cursor.rowcount == 0:
+                raise DuplicateEntryError(verification_data.get('email'))
+            
+            logger.info("Email verification created with ID: %s", verification_id)
             return verification_id
             
-        except Error as e:
-            print(f"Error creating email verification: {e}")
+        except Error:
+            logger.exception("Error creating email verification")
             return None
         finally:
             if cursor:
@@ -837,8 +1166,6 @@ class UserDB:
         - Verification data if valid, None otherwise
         """
         try:
-            from datetime import datetime
-            
             conn = self.db.get_connection()
             cursor = conn.cursor(dictionary=True)
             
@@ -866,13 +1193,94 @@ class UserDB:
                 conn.commit()
                 return None
             
-        except Error as e:
-            print(f"Error verifying email code: {e}")
+        except Error:
+            logger.exception("Error verifying email code")
             return None
         finally:
             if cursor:
                 cursor.close()
     
+    def complete_patient_registration(self, email: str, code: str) -> dict:
+        """
+        Check a verification code and create the patient in one transaction
+        
+        The verification row is locked, copied into patients and deleted
+        before a single commit, so a failed insert never leaves the
+        verification marked as used.
+        
+        Parameters:
+        - email: User's email address
+        - code: 6-digit verification code
+        
+        Returns:
+        - {'patient_id', 'first_name'} if the code is valid, None otherwise
+        
+        Raises:
+        - DuplicateEntryError if the email is already registered
+        - Error on any other database failure (after rolling back)
+        """
+        cursor = None
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            
+            query = """
+                SELECT first_name, last_name, phone, date_of_birth, pin
+                FROM email_verifications 
+                WHERE email = %s AND verification_code = %s 
+                AND expires_at > %s AND verified = FALSE AND attempts < 5
+                LIMIT 1
+                FOR UPDATE
+            """
+            cursor.execute(query, (email, code, datetime.now()))
+            verification = cursor.fetchone()
+            
+            if not verification:
+                # Increment attempts
+                update_query = """
+                    UPDATE email_verifications SET attempts = attempts + 1 
+                    WHERE email = %s AND verified = FALSE
+                """
+                cursor.execute(update_query, (email,))
+                conn.commit()
+                return None
+            
+            patient_id = str(uuid.uuid4())
+            
+            insert_query = """
+                INSERT INTO patients (
+                    id, first_name, last_name, email, phone, date_of_birth, pin
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """
+            cursor.execute(insert_query, (
+                patient_id,
+                verification['first_name'],
+                verification['last_name'],
+                email,
+                verification['phone'],
+                verification['date_of_birth'],
+                verification['pin']  # Already hashed
+            ))
+            
+            cursor.execute("DELETE FROM email_verifications WHERE email = %s", (email,))
+            conn.commit()
+            
+            logger.info("Patient registered successfully with ID: %s", patient_id)
+            return {'patient_id': patient_id, 'first_name': verification['first_name']}
+            
+        except IntegrityError as e:
+            conn.rollback()
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise DuplicateEntryError(email) from e
+            raise
+        except Error:
+            conn.rollback()
+            logger.exception("Error completing patient registration")
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+    
     def get_pending_verification(self, email: str) -> dict:
         """
         Get pending verification record for an email
@@ -881,8 +1289,6 @@ class UserDB:
         - Verification data if exists and not expired, None otherwise
         """
         try:
-            from datetime import datetime
-            
             conn = self.db.get_connection()
             cursor = conn.cursor(dictionary=True)
             
@@ -895,13 +1301,42 @@ class UserDB:
             
             return result
             
-        except Error as e:
-            print(f"Error getting pending verification: {e}")
+        except Error:
+            logger.exception("Error getting pending verification")
             return None
         finally:
             if cursor:
                 cursor.close()
     
+    def update_verification_code(self, email: str, code: str) -> bool:
+        """
+        Replace the code on a pending verification and restart its expiry
+        
+        Returns:
+        - True if a pending verification was updated, False otherwise
+        """
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            
+            query = """
+                UPDATE email_verifications
+                SET verification_code = %s, expires_at = %s, attempts = 0
+                WHERE email = %s AND verified = FALSE
+            """
+            expires_at = datetime.now() + timedelta(minutes=10)
+            cursor.execute(query, (code, expires_at, email))
+            conn.commit()
+            
+            return cursor.rowcount > 0
+            
+        except Error:
+            logger.exception("Error updating verification code")
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+    
     def delete_verification(self, email: str):
         """Delete verification record after successful registration"""
         try:
@@ -912,8 +1347,8 @@ class UserDB:
             cursor.execute(query, (email,))
             conn.commit()
             
-        except Error as e:
-            print(f"Error deleting verification: {e}")
+        except Error:
+            logger.exception("Error deleting verification")
         finally:
             if cursor:
                 cursor.close()
@@ -927,6 +1362,9 @@ class UserDB:
         
         Returns:
         - patient_id if successful, None otherwise
+        
+        Raises:
+        - DuplicateEntryError if the email is already registered
         """
         try:
             conn = self.db.get_connection()
@@ -953,11 +1391,16 @@ class UserDB:
             cursor.execute(query, values)
             conn.commit()
             
-            print(f"Patient registered successfully with ID: {patient_id}")
+            logger.info("Patient registered successfully with ID: %s", patient_id)
             return patient_id
             
-        except Error as e:
-            print(f"Error registering patient from verification: {e}")
+        except IntegrityError as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise DuplicateEntryError(verification_data.get('email')) from e
+            logger.exception("Error registering patient from verification")
+            return None
+        except Error:
+            logger.exception("Error registering patient from verification")
             return None
         finally:
             if cursor:
@@ -1001,12 +1444,12 @@ class UserDB:
             
             deleted = cursor.rowcount > 0
             if deleted:
-                print(f"Patient account deleted: {patient_id}")
+                logger.info("Patient account deleted: %s", patient_id)
             
             return deleted
             
-        except Error as e:
-            print(f"Error deleting patient: {e}")
+        except Error:
+            logger.exception("Error deleting patient")
             conn.rollback()
             return False
         finally:
@@ -1041,12 +1484,12 @@ class UserDB:
             
             deleted = cursor.rowcount > 0
             if deleted:
-                print(f"Doctor account deleted: {doctor_id}")
+                logger.info("Doctor account deleted: %s", doctor_id)
             
             return deleted
             
-        except Error as e:
-            print(f"Error deleting doctor: {e}")
+        except Error:
+            logger.exception("Error deleting doctor")
             conn.rollback()
             return False
         finally:
@@ -1056,6 +1499,12 @@ class UserDB:
     def close(self):
         """Close the database connection"""
         self.db.disconnect()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
 
 class PatientReportDB:
@@ -1073,9 +1522,6 @@ class PatientReportDB:
     def create_report(self, report_data: dict) -> str:
         """Create a new patient report"""
         try:
-            import uuid
-            from datetime import datetime
-            
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
@@ -1124,11 +1570,11 @@ class PatientReportDB:
             cursor.execute(query, values)
             conn.commit()
             
-            print(f"Report created with ID: {report_id}")
+            logger.info("Report created with ID: %s", report_id)
             return report_id
             
-        except Error as e:
-            print(f"Error creating report: {e}")
+        except Error:
+            logger.exception("Error creating report")
             return None
         finally:
             if cursor:
@@ -1172,8 +1618,8 @@ class PatientReportDB:
             
             return formatted_results
             
-        except Error as e:
-            print(f"Error retrieving reports: {e}")
+        except Error:
+            logger.exception("Error retrieving reports")
             return []
         finally:
             if cursor:
@@ -1210,8 +1656,8 @@ class PatientReportDB:
                 }
             return None
             
-        except Error as e:
-            print(f"Error retrieving report: {e}")
+        except Error:
+            logger.exception("Error retrieving report")
             return None
         finally:
             if cursor:
@@ -1229,8 +1675,8 @@ class PatientReportDB:
             
             return cursor.rowcount > 0
             
-        except Error as e:
-            print(f"Error updating report status: {e}")
+        except Error:
+            logger.exception("Error updating report status")
             return False
         finally:
             if cursor:
@@ -1270,8 +1716,8 @@ class PatientReportDB:
             
             return cursor.rowcount > 0
             
-        except Error as e:
-            print(f"Error updating report AI data: {e}")
+        except Error:
+            logger.exception("Error updating report AI data")
             return False
         finally:
             if cursor:
@@ -1297,12 +1743,12 @@ class PatientReportDB:
             
             deleted = cursor.rowcount > 0
             if deleted:
-                print(f"Report deleted: {report_id}")
+                logger.info("Report deleted: %s", report_id)
             
             return deleted
             
-        except Error as e:
-            print(f"Error deleting report: {e}")
+        except Error:
+            logger.exception("Error deleting report")
             return False
         finally:
             if cursor:
@@ -1313,9 +1759,6 @@ class PatientReportDB:
     def create_consent(self, consent_data: dict) -> str:
         """Create a new consent"""
         try:
-            import uuid
-            from datetime import datetime
-            
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
@@ -1352,11 +1795,11 @@ class PatientReportDB:
             cursor.execute(query, values)
             conn.commit()
             
-            print(f"Consent created with ID: {consent_id}")
+            logger.info("Consent created with ID: %s", consent_id)
             return consent_id
             
-        except Error as e:
-            print(f"Error creating consent: {e}")
+        except Error:
+            logger.exception("Error creating consent")
             return None
         finally:
             if cursor:
@@ -1395,8 +1838,8 @@ class PatientReportDB:
             
             return formatted
             
-        except Error as e:
-            print(f"Error retrieving consents: {e}")
+        except Error:
+            logger.exception("Error retrieving consents")
             return []
         finally:
             if cursor:
@@ -1435,8 +1878,8 @@ class PatientReportDB:
             
             return formatted
             
-        except Error as e:
-            print(f"Error retrieving consents: {e}")
+        except Error:
+            logger.exception("Error retrieving consents")
             return []
         finally:
             if cursor:
@@ -1454,8 +1897,8 @@ class PatientReportDB:
             
             return cursor.rowcount > 0
             
-        except Error as e:
-            print(f"Error revoking consent: {e}")
+        except Error:
+            logger.exception("Error revoking consent")
             return False
         finally:
             if cursor:
@@ -1466,9 +1909,6 @@ class PatientReportDB:
     def create_assignment(self, assignment_data: dict) -> str:
         """Create a doctor-patient assignment"""
         try:
-            import uuid
-            from datetime import datetime
-            
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
@@ -1503,8 +1943,8 @@ class PatientReportDB:
             
             return assignment_id
             
-        except Error as e:
-            print(f"Error creating assignment: {e}")
+        except Error:
+            logger.exception("Error creating assignment")
             return None
         finally:
             if cursor:
@@ -1543,8 +1983,8 @@ class PatientReportDB:
             
             return formatted
             
-        except Error as e:
-            print(f"Error retrieving assignments: {e}")
+        except Error:
+            logger.exception("Error retrieving assignments")
             return []
         finally:
             if cursor:
@@ -1580,8 +2020,8 @@ class PatientReportDB:
             
             return formatted
             
-        except Error as e:
-            print(f"Error retrieving assignments: {e}")
+        except Error:
+            logger.exception("Error retrieving assignments")
             return []
         finally:
             if cursor:
@@ -1600,10 +2040,6 @@ class PatientReportDB:
         - verification_id if successful, None otherwise
         """
         try:
-            import uuid
-            import hashlib
-            from datetime import datetime, timedelta
-            
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
@@ -1641,11 +2077,11 @@ class PatientReportDB:
             cursor.execute(query, values)
             conn.commit()
             
-            print(f"Email verification created with ID: {verification_id}")
+            logger.info("Email verification created with ID: %s", verification_id)
             return verification_id
             
-        except Error as e:
-            print(f"Error creating email verification: {e}")
+        except Error:
+            logger.exception("Error creating email verification")
             return None
         finally:
             if cursor:
@@ -1663,8 +2099,6 @@ class PatientReportDB:
         - Verification data if valid, None otherwise
         """
         try:
-            from datetime import datetime
-            
             conn = self.db.get_connection()
             cursor = conn.cursor(dictionary=True)
             
@@ -1692,8 +2126,8 @@ class PatientReportDB:
                 conn.commit()
                 return None
             
-        except Error as e:
-            print(f"Error verifying email code: {e}")
+        except Error:
+            logger.exception("Error verifying email code")
             return None
         finally:
             if cursor:
@@ -1707,8 +2141,6 @@ class PatientReportDB:
         - Verification data if exists and not expired, None otherwise
         """
         try:
-            from datetime import datetime
-            
             conn = self.db.get_connection()
             cursor = conn.cursor(dictionary=True)
             
@@ -1721,8 +2153,8 @@ class PatientReportDB:
             
             return result
             
-        except Error as e:
-            print(f"Error getting pending verification: {e}")
+        except Error:
+            logger.exception("Error getting pending verification")
             return None
         finally:
             if cursor:
@@ -1738,8 +2170,8 @@ class PatientReportDB:
             cursor.execute(query, (email,))
             conn.commit()
             
-        except Error as e:
-            print(f"Error deleting verification: {e}")
+        except Error:
+            logger.exception("Error deleting verification")
         finally:
             if cursor:
                 cursor.close()
@@ -1755,8 +2187,6 @@ class PatientReportDB:
         - patient_id if successful, None otherwise
         """
         try:
-            import uuid
-            
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
@@ -1781,11 +2211,11 @@ class PatientReportDB:
             cursor.execute(query, values)
             conn.commit()
             
-            print(f"Patient registered successfully with ID: {patient_id}")
+            logger.info("Patient registered successfully with ID: %s", patient_id)
             return patient_id
             
-        except Error as e:
-            print(f"Error registering patient from verification: {e}")
+        except Error:
+            logger.exception("Error registering patient from verification")
             return None
         finally:
             if cursor:
@@ -0,0 +1,21 @@
+"""
+Gunicorn configuration for the summary service
+
+Usage: gunicorn -c gunicorn.conf.py summary_service:app
+
+Requests spend nearly all their time waiting on Gemini, so each worker
+runs a pool of threads. The app is preloaded so workers share its
+imported modules copy-on-write; database connections and model clients
+are created lazily and therefore never cross the fork.
+"""
+
+import os
+
+bind = os.getenv("SUMMARY_BIND", "0.0.0.0:8004")
+worker_class = "gthread"
+workers = int(os.getenv("SUMMARY_WORKERS", 2))
+threads = int(os.getenv("SUMMARY_THREADS", 8))
+preload_app = True
+
+# Full summaries make an LLM round-trip that can take tens of seconds
+timeout = 120
@@ -0,0 +1,31 @@
+-- Migration: Add composite indexes for patient/doctor lookup queries
+-- Run this script once on existing databases created before these indexes
+-- were added to schema.sql
+
+USE medical_reports_db;
+
+-- Patient reports listing: WHERE patient_id = ? ORDER BY uploaded_at DESC
+ALTER TABLE patient_reports
+ADD INDEX idx_report_patient_uploaded (patient_id, uploaded_at);
+
+-- Patient consents listing: WHERE patient_id = ? ORDER BY created_at DESC
+ALTER TABLE consents
+ADD INDEX idx_consent_patient_created (patient_id, created_at);
+
+-- Doctor consents listing: WHERE doctor_id = ? AND active = TRUE ORDER BY created_at DESC
+ALTER TABLE consents
+ADD INDEX idx_consent_doctor_active (doctor_id, active, created_at);
+
+-- Active-consent join used by the doctor assignments listing
+ALTER TABLE consents
+ADD INDEX idx_consent_doctor_patient (doctor_id, patient_id, active);
+
+-- Assignment listings: WHERE doctor_id/patient_id = ? ORDER BY assigned_at DESC
+ALTER TABLE assignments
+ADD INDEX idx_assignment_doctor_assigned (doctor_id, assigned_at),
+ADD INDEX idx_assignment_patient_assigned (patient_id, assigned_at);
+
+-- Verify the lookups now use the new indexes (type should be "ref")
+-- EXPLAIN SELECT * FROM patient_reports WHERE patient_id = 'x' ORDER BY uploaded_at DESC;
+-- EXPLAIN SELECT * FROM consents WHERE doctor_id = 'x' AND active = TRUE ORDER BY created_at DESC;
+-- EXPLAIN SELECT * FROM assignments WHERE patient_id = 'x' ORDER BY assigned_at DESC;
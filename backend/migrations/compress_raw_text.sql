@@ -0,0 +1,10 @@
+-- Migration: Store medical_reports.raw_text as zlib-compressed bytes
+-- Run this script once on existing databases created before raw_text
+-- became a BLOB column in schema.sql
+
+USE medical_reports_db;
+
+-- Existing rows keep their plain UTF-8 text, which the application still
+-- reads correctly; rows written from now on are compressed
+ALTER TABLE medical_reports
+MODIFY COLUMN raw_text LONGBLOB;
@@ -24,6 +24,7 @@ def ask_question():
         "report_id": "RPT-..."
     }
     """
+    db = MedicalReportDB()
     try:
         data = request.get_json()
         
@@ -38,7 +39,6 @@ def ask_question():
             return jsonify({'error': 'Question too short'}), 400
         
         # Get report from database
-        db = MedicalReportDB()
         report = db.get_report_by_id(report_id)
         
         if not report:
@@ -67,14 +67,16 @@ def ask_question():
             'error': 'Error processing question',
             'message': str(e)
         }), 500
+    finally:
+        db.close()
 
 @chat_bp.route('/history/<report_id>', methods=['GET'])
 def get_chat_history(report_id):
     """Get chat history for a report"""
+    db = MedicalReportDB()
     try:
         limit = request.args.get('limit', 50, type=int)
         
-        db = MedicalReportDB()
         history = db.get_query_history(report_id)
         
         # Limit results
@@ -93,6 +95,8 @@ def get_chat_history(report_id):
     except Exception as e:
         logger.error(f"Error fetching chat history: {str(e)}")
         return jsonify({'error': str(e)}), 500
+    finally:
+        db.close()
 
 @chat_bp.route('/history/<report_id>/<int:history_id>', methods=['DELETE'])
 def delete_chat_history(report_id, history_id):
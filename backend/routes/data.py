@@ -3,204 +3,183 @@ Data Routes for Reports, Consents, and Assignments
 Handles persistent storage in MySQL
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
+from werkzeug.exceptions import HTTPException
+import logging
 from db_config import PatientReportDB
 
+logger = logging.getLogger(__name__)
 data_bp = Blueprint('data', __name__)
 
 
+def get_db() -> PatientReportDB:
+    """
+    Get the request-scoped database handle, connecting on first use
+
+    Routes call this only after validation passes, so requests rejected
+    early never open a connection.
+    """
+    if 'db' not in g:
+        g.db = PatientReportDB()
+    return g.db
+
+
+@data_bp.teardown_app_request
+def close_db(exc):
+    """Close the database handle if this request opened one"""
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+
+
+@data_bp.errorhandler(Exception)
+def handle_error(e):
+    """Return the shared JSON error body for any unhandled route exception"""
+    if isinstance(e, HTTPException):
+        return e
+    logger.exception("Error handling %s %s", request.method, request.path)
+    return jsonify({
+        'success': False,
+        'error': 'Internal server error'
+    }), 500
+
+
 # ==================== REPORT ROUTES ====================
 
 @data_bp.route('/api/reports', methods=['POST'])
 def create_report():
     """Create a new patient report"""
-    try:
-        data = request.get_json()
-        
-        if not data.get('patientId'):
-            return jsonify({
-                'success': False,
-                'error': 'patientId is required'
-            }), 400
-        
-        db = PatientReportDB()
-        report_id = db.create_report(data)
-        db.close()
-        
-        if report_id:
-            return jsonify({
-                'success': True,
-                'reportId': report_id
-            }), 201
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to create report'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error creating report: {e}")
+    data = request.get_json()
+    
+    if not data.get('patientId'):
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
+            'error': 'patientId is required'
+        }), 400
+    
+    db = get_db()
+    report_id = db.create_report(data)
+    
+    if report_id:
+        return jsonify({
+            'success': True,
+            'reportId': report_id
+        }), 201
+    else:
+        return jsonify({
+            'success': False,
+            'error': 'Failed to create report'
         }), 500
 
 
 @data_bp.route('/api/patients/<patient_id>/reports', methods=['GET'])
 def get_patient_reports(patient_id):
     """Get all reports for a patient"""
-    try:
-        db = PatientReportDB()
-        reports = db.get_reports_by_patient_id(patient_id)
-        db.close()
-        
-        return jsonify({
-            'success': True,
-            'reports': reports
-        }), 200
-        
-    except Exception as e:
-        print(f"Error retrieving reports: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    db = get_db()
+    reports = db.get_reports_by_patient_id(patient_id)
+    
+    return jsonify({
+        'success': True,
+        'reports': reports
+    }), 200
 
 
 @data_bp.route('/api/patients/<patient_id>/reports/<report_id>', methods=['DELETE'])
 def delete_patient_report(patient_id, report_id):
     """Delete a patient's report"""
-    try:
-        db = PatientReportDB()
-        
-        # First verify the report belongs to this patient
-        report = db.get_report_by_id(report_id)
-        if not report:
-            db.close()
-            return jsonify({
-                'success': False,
-                'error': 'Report not found'
-            }), 404
-        
-        if report.get('patientId') != patient_id:
-            db.close()
-            return jsonify({
-                'success': False,
-                'error': 'Unauthorized to delete this report'
-            }), 403
-        
-        success = db.delete_report(report_id)
-        db.close()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Report deleted successfully'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to delete report'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error deleting report: {e}")
+    db = get_db()
+    
+    # First verify the report belongs to this patient
+    report = db.get_report_by_id(report_id)
+    if not report:
+        return jsonify({
+            'success': False,
+            'error': 'Report not found'
+        }), 404
+    
+    if report.get('patientId') != patient_id:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
+            'error': 'Unauthorized to delete this report'
+        }), 403
+    
+    success = db.delete_report(report_id)
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'message': 'Report deleted successfully'
+        }), 200
+    else:
+        return jsonify({
+            'success': False,
+            'error': 'Failed to delete report'
         }), 500
 
 
 @data_bp.route('/api/reports/<report_id>', methods=['GET'])
 def get_report(report_id):
     """Get a specific report"""
-    try:
-        db = PatientReportDB()
-        report = db.get_report_by_id(report_id)
-        db.close()
-        
-        if report:
-            return jsonify({
-                'success': True,
-                'report': report
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Report not found'
-            }), 404
-            
-    except Exception as e:
-        print(f"Error retrieving report: {e}")
+    db = get_db()
+    report = db.get_report_by_id(report_id)
+    
+    if report:
+        return jsonify({
+            'success': True,
+            'report': report
+        }), 200
+    else:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'error': 'Report not found'
+        }), 404
 
 
 @data_bp.route('/api/reports/<report_id>/status', methods=['PUT'])
 def update_report_status(report_id):
     """Update report status"""
-    try:
-        data = request.get_json()
-        status = data.get('status')
-        
-        if not status:
-            return jsonify({
-                'success': False,
-                'error': 'status is required'
-            }), 400
-        
-        db = PatientReportDB()
-        success = db.update_report_status(report_id, status)
-        db.close()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Status updated'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Report not found'
-            }), 404
-            
-    except Exception as e:
-        print(f"Error updating status: {e}")
+    data = request.get_json()
+    status = data.get('status')
+    
+    if not status:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'error': 'status is required'
+        }), 400
+    
+    db = get_db()
+    success = db.update_report_status(report_id, status)
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'message': 'Status updated'
+        }), 200
+    else:
+        return jsonify({
+            'success': False,
+            'error': 'Report not found'
+        }), 404
 
 
 @data_bp.route('/api/reports/<report_id>/ai', methods=['PUT'])
 def update_report_ai_data(report_id):
     """Update report with AI-generated data"""
-    try:
-        data = request.get_json()
-        
-        db = PatientReportDB()
-        success = db.update_report_ai_data(report_id, data)
-        db.close()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'AI data updated'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Report not found'
-            }), 404
-            
-    except Exception as e:
-        print(f"Error updating AI data: {e}")
+    data = request.get_json()
+    
+    db = get_db()
+    success = db.update_report_ai_data(report_id, data)
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'message': 'AI data updated'
+        }), 200
+    else:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'error': 'Report not found'
+        }), 404
 
 
 # ==================== CONSENT ROUTES ====================
@@ -208,107 +187,71 @@ def update_report_ai_data(report_id):
 @data_bp.route('/api/consents', methods=['POST'])
 def create_consent():
     """Create a new consent"""
-    try:
-        data = request.get_json()
-        
-        required = ['patientId', 'doctorId', 'permissions', 'startDate', 'endDate']
-        for field in required:
-            if not data.get(field):
-                return jsonify({
-                    'success': False,
-                    'error': f'{field} is required'
-                }), 400
-        
-        db = PatientReportDB()
-        consent_id = db.create_consent(data)
-        db.close()
-        
-        if consent_id:
-            return jsonify({
-                'success': True,
-                'consentId': consent_id
-            }), 201
-        else:
+    data = request.get_json()
+    
+    required = ['patientId', 'doctorId', 'permissions', 'startDate', 'endDate']
+    for field in required:
+        if not data.get(field):
             return jsonify({
                 'success': False,
-                'error': 'Failed to create consent'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error creating consent: {e}")
+                'error': f'{field} is required'
+            }), 400
+    
+    db = get_db()
+    consent_id = db.create_consent(data)
+    
+    if consent_id:
+        return jsonify({
+            'success': True,
+            'consentId': consent_id
+        }), 201
+    else:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
+            'error': 'Failed to create consent'
         }), 500
 
 
 @data_bp.route('/api/patients/<patient_id>/consents', methods=['GET'])
 def get_patient_consents(patient_id):
     """Get all consents for a patient"""
-    try:
-        db = PatientReportDB()
-        consents = db.get_consents_by_patient_id(patient_id)
-        db.close()
-        
-        return jsonify({
-            'success': True,
-            'consents': consents
-        }), 200
-        
-    except Exception as e:
-        print(f"Error retrieving consents: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    db = get_db()
+    consents = db.get_consents_by_patient_id(patient_id)
+    
+    return jsonify({
+        'success': True,
+        'consents': consents
+    }), 200
 
 
 @data_bp.route('/api/doctors/<doctor_id>/consents', methods=['GET'])
 def get_doctor_consents(doctor_id):
     """Get all consents for a doctor"""
-    try:
-        db = PatientReportDB()
-        consents = db.get_consents_by_doctor_id(doctor_id)
-        db.close()
-        
-        return jsonify({
-            'success': True,
-            'consents': consents
-        }), 200
-        
-    except Exception as e:
-        print(f"Error retrieving consents: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    db = get_db()
+    consents = db.get_consents_by_doctor_id(doctor_id)
+    
+    return jsonify({
+        'success': True,
+        'consents': consents
+    }), 200
 
 
 @data_bp.route('/api/consents/<consent_id>/revoke', methods=['POST'])
 def revoke_consent(consent_id):
     """Revoke a consent"""
-    try:
-        db = PatientReportDB()
-        success = db.revoke_consent(consent_id)
-        db.close()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Consent revoked'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Consent not found'
-            }), 404
-            
-    except Exception as e:
-        print(f"Error revoking consent: {e}")
+    db = get_db()
+    success = db.revoke_consent(consent_id)
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'message': 'Consent revoked'
+        }), 200
+    else:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'error': 'Consent not found'
+        }), 404
 
 
 # ==================== ASSIGNMENT ROUTES ====================
@@ -316,75 +259,48 @@ def revoke_consent(consent_id):
 @data_bp.route('/api/assignments', methods=['POST'])
 def create_assignment():
     """Create a doctor-patient assignment"""
-    try:
-        data = request.get_json()
-        
-        if not data.get('doctorId') or not data.get('patientId'):
-            return jsonify({
-                'success': False,
-                'error': 'doctorId and patientId are required'
-            }), 400
-        
-        db = PatientReportDB()
-        assignment_id = db.create_assignment(data)
-        db.close()
-        
-        if assignment_id:
-            return jsonify({
-                'success': True,
-                'assignmentId': assignment_id
-            }), 201
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to create assignment'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error creating assignment: {e}")
+    data = request.get_json()
+    
+    if not data.get('doctorId') or not data.get('patientId'):
+        return jsonify({
+            'success': False,
+            'error': 'doctorId and patientId are required'
+        }), 400
+    
+    db = get_db()
+    assignment_id = db.create_assignment(data)
+    
+    if assignment_id:
+        return jsonify({
+            'success': True,
+            'assignmentId': assignment_id
+        }), 201
+    else:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
+            'error': 'Failed to create assignment'
         }), 500
 
 
 @data_bp.route('/api/doctors/<doctor_id>/assignments', methods=['GET'])
 def get_doctor_assignments(doctor_id):
     """Get all patients assigned to a doctor"""
-    try:
-        db = PatientReportDB()
-        assignments = db.get_assignments_by_doctor_id(doctor_id)
-        db.close()
-        
-        return jsonify({
-            'success': True,
-            'assignments': assignments
-        }), 200
-        
-    except Exception as e:
-        print(f"Error retrieving assignments: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    db = get_db()
+    assignments = db.get_assignments_by_doctor_id(doctor_id)
+    
+    return jsonify({
+        'success': True,
+        'assignments': assignments
+    }), 200
 
 
 @data_bp.route('/api/patients/<patient_id>/assignments', methods=['GET'])
 def get_patient_assignments(patient_id):
     """Get all doctors assigned to a patient"""
-    try:
-        db = PatientReportDB()
-        assignments = db.get_assignments_by_patient_id(patient_id)
-        db.close()
-        
-        return jsonify({
-            'success': True,
-            'assignments': assignments
-        }), 200
-        
-    except Exception as e:
-        print(f"Error retrieving assignments: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    db = get_db()
+    assignments = db.get_assignments_by_patient_id(patient_id)
+    
+    return jsonify({
+        'success': True,
+        'assignments': assignments
+    }), 200
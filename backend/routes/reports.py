@@ -1,9 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import FileStorage
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
 import logging
 import os
 from datetime import datetime
-import uuid
+import secrets
 
 from utils.pdf_processor import PDFProcessor, TextSplitter
 from utils.rag_processor import RAGProcessor
@@ -14,28 +18,113 @@ reports_bp = Blueprint('reports', __name__)
 
 ALLOWED_EXTENSIONS = {'pdf'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Uploads are processed off the request thread; clients poll GET /<report_id>
+report_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('REPORT_WORKERS', 2)),
+    thread_name_prefix='report-worker'
+)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1).lower() in ALLOWED_EXTENSIONS
 
+def not_modified(etag):
+    """Return a 304 response if the client already holds this ETag, else None"""
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+def process_report(report_id: str, file_bytes: bytes, file_name: str, patient_id: str = None):
+    """
+    Run the full pipeline for an uploaded report and store the result
+    
+    Executed on report_executor. The report row is created as 'pending'
+    by upload_report and moves to 'processed' or 'failed' here.
+    """
+    db = MedicalReportDB()
+    try:
+        logger.info(f"Processing report {report_id} ({file_name})")
+        
+        # Extract PDF text
+        pdf_processor = PDFProcessor()
+        raw_text, filename = pdf_processor.extract_text(
+            FileStorage(stream=io.BytesIO(file_bytes), filename=file_name)
+        )
+        
+        # Split text into chunks
+        text_splitter = TextSplitter()
+        text_chunks = text_splitter.split_text(raw_text)
+        
+        # Create vector store
+        rag_processor = RAGProcessor()
+        report_uuid = secrets.token_hex(4).upper()
+        faiss_path = f"faiss_index_{report_uuid}"
+        faiss_path = rag_processor.create_vector_store(text_chunks, faiss_path)
+        
+        # Extract medical information
+        logger.info("Extracting medical information...")
+        info = rag_processor.extract_medical_info(raw_text)
+        
+        # Generate summary
+        logger.info("Generating summary...")
+        summary = rag_processor.generate_summary(raw_text)
+        
+        # Prepare database record
+        report_data = {
+            'file_name': filename,
+            'patient_name': info.patient_name,
+            'patient_age': info.patient_age,
+            'patient_gender': info.patient_gender or 'Unknown',
+            'patient_id': patient_id or info.patient_id,
+            'report_date': info.report_date,
+            'report_type': info.report_type or 'Medical Report',
+            'hospital_name': info.hospital_name,
+            'doctor_name': info.doctor_name,
+            'summary': summary if summary else "Report processed. Ask questions to explore.",
+            'diagnosis': info.diagnosis,
+            'key_findings': info.key_findings,
+            'test_results': info.test_results,
+            'recommendations': info.recommendations,
+            'raw_text': raw_text,  # Stored zlib-compressed for reference
+            'faiss_index_path': faiss_path
+        }
+        
+        # Save to database together with the individual test results
+        if not db.complete_report(report_id, report_data, info.test_results):
+            db.mark_report_failed(report_id)
+            logger.error(f"Could not store processed report {report_id}")
+            return
+        
+        logger.info(f"Report processed: {report_id}")
+        
+    except Exception as e:
+        logger.error(f"Error processing report {report_id}: {str(e)}")
+        db.mark_report_failed(report_id)
+    finally:
+        db.close()
+
 @reports_bp.route('/upload', methods=['POST'])
 def upload_report():
     """
-    Upload and process medical report
+    Upload a medical report and queue it for processing
     
     Expected:
     - file: PDF file
     - patient_id: (optional) Patient ID for linking
     
-    Returns:
+    Returns (202):
     {
         "success": true,
         "report_id": "RPT-timestamp-uuid",
-        "message": "Report processed successfully",
-        "patient_name": "...",
-        "diagnosis": "...",
-        "summary": "..."
+        "status": "processing",
+        "message": "Report queued for processing"
     }
+    
+    Poll GET /<report_id> until processed_status is 'processed' or 'failed'.
     """
     try:
         # Validate request
@@ -58,69 +147,25 @@ def upload_report():
         if file_length > MAX_FILE_SIZE:
             return jsonify({'error': 'File too large'}), 413
         
-        logger.info(f"Processing uploaded file: {file.filename}")
-        
-        # Extract PDF text
-        pdf_processor = PDFProcessor()
-        raw_text, filename = pdf_processor.extract_text(file)
-        
-        # Split text into chunks
-        text_splitter = TextSplitter()
-        text_chunks = text_splitter.split_text(raw_text)
+        logger.info(f"Queueing uploaded file: {file.filename}")
         
-        # Create vector store
-        rag_processor = RAGProcessor()
-        report_uuid = str(uuid.uuid4())[:8].upper()
-        faiss_path = f"faiss_index_{report_uuid}"
-        faiss_path = rag_processor.create_vector_store(text_chunks, faiss_path)
-        
-        # Extract medical information
-        logger.info("Extracting medical information...")
-        extracted_info = rag_processor.extract_medical_info(raw_text)
-        
-        # Generate summary
-        logger.info("Generating summary...")
-        summary = rag_processor.generate_summary(raw_text)
-        
-        # Prepare database record
-        report_data = {
-            'file_name': filename,
-            'patient_name': extracted_info.get('patient_name'),
-            'patient_age': extracted_info.get('patient_age'),
-            'patient_gender': extracted_info.get('patient_gender', 'Unknown'),
-            'patient_id': request.form.get('patient_id') or extracted_info.get('patient_id'),
-            'report_date': extracted_info.get('report_date'),
-            'report_type': extracted_info.get('report_type', 'Medical Report'),
-            'hospital_name': extracted_info.get('hospital_name'),
-            'doctor_name': extracted_info.get('doctor_name'),
-            'summary': summary if summary else "Report processed. Ask questions to explore.",
-            'diagnosis': extracted_info.get('diagnosis'),
-            'key_findings': extracted_info.get('key_findings'),
-            'test_results': extracted_info.get('test_results', []),
-            'recommendations': extracted_info.get('recommendations'),
-            'raw_text': raw_text[:65000],
-            'faiss_index_path': faiss_path,
-            'processed_status': 'processed'
-        }
+        patient_id = request.form.get('patient_id')
         
-        # Save to database
         db = MedicalReportDB()
-        report_id = db.save_report(report_data)
+        report_id = db.create_pending_report(file.filename, patient_id)
+        db.close()
         
-        # Save test results if available
-        if extracted_info.get('test_results'):
-            db.save_test_results(report_id, extracted_info.get('test_results'))
+        if not report_id:
+            return jsonify({'error': 'Error queueing report'}), 500
         
-        logger.info(f"Report saved with ID: {report_id}")
+        report_executor.submit(process_report, report_id, file.read(), file.filename, patient_id)
         
         return jsonify({
             'success': True,
             'report_id': report_id,
-            'message': 'Report processed successfully',
-            'patient_name': extracted_info.get('patient_name'),
-            'diagnosis': extracted_info.get('diagnosis'),
-            'summary': summary[:500] + "..." if len(summary) > 500 else summary
-        }), 200
+            'status': 'processing',
+            'message': 'Report queued for processing'
+        }), 202
         
     except Exception as e:
         logger.error(f"Error uploading report: {str(e)}")
@@ -132,8 +177,8 @@ def upload_report():
 @reports_bp.route('/<report_id>', methods=['GET'])
 def get_report(report_id):
     """Get report details by ID"""
+    db = MedicalReportDB()
     try:
-        db = MedicalReportDB()
         report = db.get_report_by_id(report_id)
         
         if not report:
@@ -143,38 +188,71 @@ def get_report(report_id):
         report['upload_date'] = str(report['upload_date'])
         report['last_updated'] = str(report['last_updated'])
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'data': report
-        }), 200
+        })
+        
+        # Tag the body itself: last_updated has one-second resolution, so a
+        # status change within the same second would otherwise keep the tag
+        etag = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        response.set_etag(etag, weak=True)
+        return response, 200
         
     except Exception as e:
         logger.error(f"Error fetching report: {str(e)}")
         return jsonify({'error': str(e)}), 500
+    finally:
+        db.close()
 
 @reports_bp.route('/patient/<patient_id>', methods=['GET'])
 def get_patient_reports(patient_id):
-    """Get all reports for a patient"""
+    """
+    Get reports for a patient, newest first, one page at a time
+    
+    Query params:
+    - limit: Page size (default 50, max 200)
+    - after: next_cursor value from the previous page
+    """
+    db = MedicalReportDB()
     try:
-        db = MedicalReportDB()
-        # Implement search for patient_id in database
-        results = db.search_reports(patient_id)
+        limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+        after_id = request.args.get('after', type=int)
         
-        return jsonify({
+        results = db.get_reports_by_patient_id(patient_id, limit, after_id)
+        
+        # Tag the page by the rows it holds, so an insert, delete or edit
+        # anywhere in the page changes it
+        page = repr([(r['id'], r.get('last_updated')) for r in results]).encode()
+        etag = f"{after_id}-{limit}-" + hashlib.blake2b(page, digest_size=16).hexdigest()
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        response = jsonify({
             'success': True,
             'count': len(results),
-            'data': results
-        }), 200
+            'data': results,
+            'next_cursor': results[-1]['id'] if len(results) == limit else None
+        })
+        response.set_etag(etag, weak=True)
+        return response, 200
         
     except Exception as e:
         logger.error(f"Error fetching patient reports: {str(e)}")
         return jsonify({'error': str(e)}), 500
+    finally:
+        db.close()
 
 @reports_bp.route('/<report_id>', methods=['DELETE'])
 def delete_report(report_id):
     """Delete a report"""
+    db = MedicalReportDB()
     try:
-        db = MedicalReportDB()
         success = db.delete_report(report_id)
         
         if not success:
@@ -189,3 +267,5 @@ def delete_report(report_id):
     except Exception as e:
         logger.error(f"Error deleting report: {str(e)}")
         return jsonify({'error': str(e)}), 500
+    finally:
+        db.close()
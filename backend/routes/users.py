@@ -3,30 +3,174 @@ User Authentication Routes
 Handles patient and doctor registration/login with MySQL storage
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, abort, g, request, jsonify, stream_with_context
+from werkzeug.exceptions import HTTPException
+from functools import lru_cache, wraps
+from operator import itemgetter
+import base64
+import hashlib
+import logging
+import orjson
 import re
-from db_config import UserDB
-from utils.email_service import EmailService
+import secrets
+import string
+import threading
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor
+import os
+from db_config import UserDB, DuplicateEntryError
+from utils.email_service import EmailService, email_service
 
 users_bp = Blueprint('users', __name__)
+logger = logging.getLogger(__name__)
+
+# Every user-route body is a handful of short fields; anything larger is
+# rejected before it is read. The app-wide MAX_CONTENT_LENGTH stays high
+# for report uploads.
+MAX_JSON_BODY = 8 * 1024
+
+# SMTP sends run off the request thread; EmailService logs its own failures
+email_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('EMAIL_WORKERS', 4)),
+    thread_name_prefix='email-worker'
+)
+
+# Serialized listing responses keyed by 'patients' / 'doctors'.
+# Entries are dropped on every write that changes the listing; the TTL only
+# bounds staleness from writes made outside this process.
+_list_cache = TTLCache(maxsize=4, ttl=60)
+_list_cache_lock = threading.Lock()
+
+# Bumped by every invalidation; a listing read before a write must not be
+# cached after it
+_list_generation = {'patients': 0, 'doctors': 0}
+
+
+def invalidate_listing(key: str):
+    """Drop a cached listing after a write that changes it"""
+    with _list_cache_lock:
+        _list_cache.pop(key, None)
+        _list_generation[key] += 1
+
+
+def cached_listing(key: str):
+    """Return (cached body or None, generation to pass to store_listing)"""
+    with _list_cache_lock:
+        return _list_cache.get(key), _list_generation[key]
+
+
+def store_listing(key: str, body: bytes, generation: int):
+    """Cache a listing unless it was invalidated while being read"""
+    with _list_cache_lock:
+        if _list_generation[key] == generation:
+            _list_cache[key] = body
+
+
+# Fingerprint enrollment status by email. The frontend polls it on every
+# page load while it only changes when a credential is registered or the
+# account is deleted, both of which invalidate the entry.
+_fingerprint_status = TTLCache(maxsize=10_000, ttl=30)
+_fingerprint_status_lock = threading.Lock()
+
+
+def invalidate_fingerprint_status(email: str):
+    """Drop a cached fingerprint status after a write that changes it"""
+    with _fingerprint_status_lock:
+        _fingerprint_status.pop(email, None)
+
+
+# Recently rejected credentials keyed by (role, identifier, short digest of
+# the secret), so a repeated bad attempt is answered without a database
+# query.
+_failed_logins = TTLCache(maxsize=10_000, ttl=60)
+_login_lock = threading.Lock()
+
+
+def login_attempt_key(role: str, identifier: str, secret: str) -> tuple:
+    """Key a login attempt without keeping the plaintext secret in memory"""
+    return role, identifier, hashlib.blake2b(secret.encode(), digest_size=8).digest()
+
+
+def is_known_failed_login(key: tuple) -> bool:
+    """Check whether this exact attempt was recently rejected"""
+    with _login_lock:
+        return key in _failed_logins
+
+
+def record_failed_login(key: tuple):
+    """Remember a rejected attempt for the cache's TTL"""
+    with _login_lock:
+        _failed_logins[key] = True
+
+
+@lru_cache(maxsize=128)
+def _error_body(message: str) -> bytes:
+    """Serialize an error payload once per distinct message"""
+    return orjson.dumps({'success': False, 'error': message})
+
+
+def error_response(message: str, status: int) -> Response:
+    """
+    Build a JSON error response from a cached body
+    
+    A fresh Response is created per call because after_request hooks
+    (e.g. CORS) mutate response headers.
+    """
+    return Response(_error_body(message), status=status, mimetype='application/json')
+
+
+@users_bp.errorhandler(Exception)
+def handle_error(e):
+    """Return the shared JSON error body for any unhandled route exception"""
+    if isinstance(e, HTTPException):
+        return e
+    logger.exception("Error handling %s %s", request.method, request.path)
+    return error_response('Internal server error', 500)
+
+
+@users_bp.before_request
+def parse_json_body():
+    """Parse the JSON body once per request; handlers read it from g.body"""
+    if request.content_length is not None and request.content_length > MAX_JSON_BODY:
+        abort(413)
+    # get_json() returns None without reading the body for non-JSON content types
+    g.body = request.get_json(silent=True) or {}
 
 
 # ==================== VALIDATION HELPERS ====================
 
+# Patterns compiled once at import instead of on every request; used with
+# fullmatch(), so they carry no anchors
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+NAME_RE = re.compile(r'[a-zA-Z\s]+')
+PASSWORD_UPPER = frozenset(string.ascii_uppercase)
+PASSWORD_LOWER = frozenset(string.ascii_lowercase)
+PASSWORD_SPECIALS = frozenset('@$!%*?&')
+
+# Required registration fields, checked in this order
+PATIENT_REQUIRED_FIELDS = ('firstName', 'lastName', 'email', 'phone', 'dateOfBirth', 'pin')
+DOCTOR_REQUIRED_FIELDS = ('licenseId', 'fullName', 'specialization', 'password')
+
+
 def validate_phone(phone: str) -> bool:
     """Validate phone number is exactly 10 digits"""
-    return bool(re.match(r'^\d{10}$', phone))
+    return len(phone) == 10 and phone.isascii() and phone.isdigit()
 
 
+@lru_cache(maxsize=4096)
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(email_regex, email))
+    return bool(EMAIL_RE.fullmatch(email))
 
 
 def validate_pin(pin: str) -> bool:
     """Validate PIN is exactly 6 digits"""
-    return bool(re.match(r'^\d{6}$', pin))
+    return len(pin) == 6 and pin.isascii() and pin.isdigit()
+
+
+def validate_name(name: str) -> bool:
+    """Validate name is at least 2 characters and contains only letters"""
+    return len(name) >= 2 and bool(NAME_RE.fullmatch(name))
 
 
 def validate_password(password: str) -> tuple:
@@ -43,24 +187,79 @@ def validate_password(password: str) -> tuple:
     if len(password) < 8:
         return False, "Password must be at least 8 characters"
     
-    if not re.search(r'[A-Z]', password):
+    # Build the character set once; the class checks then run as C-level
+    # set operations instead of a per-character Python loop
+    chars = frozenset(password)
+    has_upper = not chars.isdisjoint(PASSWORD_UPPER)
+    has_lower = not chars.isdisjoint(PASSWORD_LOWER)
+    has_digit = any(c.isdecimal() for c in chars)
+    has_special = not chars.isdisjoint(PASSWORD_SPECIALS)
+    
+    if not has_upper:
         return False, "Password must contain at least 1 uppercase letter"
     
-    if not re.search(r'[a-z]', password):
+    if not has_lower:
         return False, "Password must contain at least 1 lowercase letter"
     
-    if not re.search(r'\d', password):
+    if not has_digit:
         return False, "Password must contain at least 1 number"
     
-    if not re.search(r'[@$!%*?&]', password):
+    if not has_special:
         return False, "Password must contain at least 1 special character (@$!%*?&)"
     
     return True, None
 
 
+def validate_body(required_fields: tuple, checks: tuple = ()):
+    """
+    Reject a request with 400 before the handler runs
+    
+    Parameters:
+    - required_fields: Body keys that must be present and non-empty, in order
+    - checks: (field, validator, error_message) tuples run after the
+      required-field pass; validator returns True when the value is valid
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            data = g.body
+            # One C-level pass on the success path; only a rejected body
+            # pays for finding which field is missing
+            if not all(map(data.get, required_fields)):
+                missing = next(field for field in required_fields if not data.get(field))
+                return error_response(f'{missing} is required', 400)
+            for field, validator, error_message in checks:
+                if not validator(data[field]):
+                    return error_response(error_message, 400)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Cheapest checks first: fixed-length digit fields, then names (which test
+# length before the regex), then the email regex
+PATIENT_CHECKS = (
+    ('pin', validate_pin, 'PIN must be exactly 6 digits'),
+    ('phone', validate_phone, 'Phone number must be exactly 10 digits'),
+    ('firstName', validate_name, 'First name must be at least 2 characters and contain only letters'),
+    ('lastName', validate_name, 'Last name must be at least 2 characters and contain only letters'),
+    ('email', validate_email, 'Invalid email address'),
+)
+
+# Patient row columns -> camelCase response keys, picked in one C-level call
+PATIENT_VIEW = itemgetter('id', 'first_name', 'last_name', 'email', 'phone', 'date_of_birth')
+PATIENT_VIEW_KEYS = ('id', 'firstName', 'lastName', 'email', 'phone', 'dateOfBirth')
+
+DOCTOR_CHECKS = (
+    ('licenseId', lambda value: len(value) >= 5, 'License ID must be at least 5 characters'),
+    ('fullName', lambda value: len(value) >= 3, 'Full name must be at least 3 characters'),
+)
+
+
 # ==================== PATIENT ROUTES ====================
 
 @users_bp.route('/api/patients/register', methods=['POST'])
+@validate_body(PATIENT_REQUIRED_FIELDS, PATIENT_CHECKS)
 def register_patient():
     """
     Initiate patient registration with email verification
@@ -78,111 +277,47 @@ def register_patient():
     This will send a verification code to the email.
     Use /api/patients/verify-email to complete registration.
     """
+    data = g.body
+    
+    first_name = data['firstName']
+    email = data['email']
+    pin = data['pin']
+    
+    # Generate verification code
+    verification_code = EmailService.generate_verification_code()
+    
+    # Store verification data; the insert itself rejects emails that
+    # already belong to a patient
+    verification_data = {
+        **data,
+        'verification_code': verification_code
+    }
+    
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['firstName', 'lastName', 'email', 'phone', 'dateOfBirth', 'pin']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({
-                    'success': False,
-                    'error': f'{field} is required'
-                }), 400
-        
-        # Validate first name (only letters, min 2 chars)
-        if len(data['firstName']) < 2 or not re.match(r'^[a-zA-Z\s]+$', data['firstName']):
-            return jsonify({
-                'success': False,
-                'error': 'First name must be at least 2 characters and contain only letters'
-            }), 400
-        
-        # Validate last name (only letters, min 2 chars)
-        if len(data['lastName']) < 2 or not re.match(r'^[a-zA-Z\s]+$', data['lastName']):
-            return jsonify({
-                'success': False,
-                'error': 'Last name must be at least 2 characters and contain only letters'
-            }), 400
-        
-        # Validate email
-        if not validate_email(data['email']):
-            return jsonify({
-                'success': False,
-                'error': 'Invalid email address'
-            }), 400
-        
-        # Validate phone (exactly 10 digits)
-        if not validate_phone(data['phone']):
-            return jsonify({
-                'success': False,
-                'error': 'Phone number must be exactly 10 digits'
-            }), 400
-        
-        # Validate PIN (exactly 6 digits)
-        if not validate_pin(data['pin']):
-            return jsonify({
-                'success': False,
-                'error': 'PIN must be exactly 6 digits'
-            }), 400
-        
-        # Check if patient already exists
-        user_db = UserDB()
-        
-        if user_db.patient_exists(data['email']):
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'A patient with this email already exists'
-            }), 409
-        
-        # Generate verification code
-        email_service = EmailService()
-        verification_code = EmailService.generate_verification_code()
-        
-        # Store verification data
-        verification_data = {
-            **data,
-            'verification_code': verification_code
-        }
-        
-        verification_id = user_db.create_email_verification(verification_data)
-        
-        if not verification_id:
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'Failed to initiate registration'
-            }), 500
-        
-        # Send verification email
-        email_sent = email_service.send_verification_email(
-            to_email=data['email'],
-            first_name=data['firstName'],
-            verification_code=verification_code,
-            pin=data['pin']
-        )
-        
-        user_db.close()
-        
-        if email_sent:
-            return jsonify({
-                'success': True,
-                'message': 'Verification code sent to your email',
-                'email': data['email'],
-                'requiresVerification': True
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to send verification email. Please check your email address or try again later.'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error in patient registration: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+        with UserDB() as user_db:
+            verification_id = user_db.create_email_verification(verification_data)
+    except DuplicateEntryError:
+        return error_response('A patient with this email already exists', 409)
+    
+    if not verification_id:
+        return error_response('Failed to initiate registration', 500)
+    
+    # Send verification email in the background; a failed send can be
+    # retried through /api/patients/resend-verification
+    email_executor.submit(
+        email_service.send_verification_email,
+        to_email=email,
+        first_name=first_name,
+        verification_code=verification_code,
+        pin=pin
+    )
+    
+    return jsonify({
+        'success': True,
+        'message': 'Verification code is being sent to your email',
+        'email': email,
+        'requiresVerification': True
+    }), 202
 
 
 @users_bp.route('/api/patients/verify-email', methods=['POST'])
@@ -196,64 +331,35 @@ def verify_email():
         "code": "123456"
     }
     """
+    data = g.body
+    
+    email = data.get('email')
+    code = data.get('code')
+    
+    if not email or not code:
+        return error_response('Email and verification code are required', 400)
+    
+    # Verify the code, create the patient and clear the verification in
+    # one transaction
     try:
-        data = request.get_json()
-        
-        email = data.get('email')
-        code = data.get('code')
-        
-        if not email or not code:
-            return jsonify({
-                'success': False,
-                'error': 'Email and verification code are required'
-            }), 400
-        
-        user_db = UserDB()
-        
-        # Verify the code
-        verification = user_db.verify_email_code(email, code)
-        
-        if not verification:
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'Invalid or expired verification code'
-            }), 400
-        
-        # Create the patient from verification data
-        patient_id = user_db.create_patient_from_verification(verification)
-        
-        if not patient_id:
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'Failed to complete registration'
-            }), 500
-        
-        # Clean up verification record
-        user_db.delete_verification(email)
-        
-        # Send welcome email (non-blocking, don't fail if email fails)
-        try:
-            email_service = EmailService()
-            email_service.send_welcome_email(email, verification['first_name'])
-        except Exception:
-            pass  # Silently ignore welcome email failures
-        
-        user_db.close()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Email verified and registration complete',
-            'patientId': patient_id
-        }), 201
-        
-    except Exception as e:
-        print(f"Error in email verification: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+        with UserDB() as user_db:
+            registration = user_db.complete_patient_registration(email, code)
+    except DuplicateEntryError:
+        return error_response('A patient with this email already exists', 409)
+    
+    if not registration:
+        return error_response('Invalid or expired verification code', 400)
+    
+    invalidate_listing('patients')
+    
+    # Send welcome email in the background; failures are only logged
+    email_executor.submit(email_service.send_welcome_email, email, registration['first_name'])
+    
+    return jsonify({
+        'success': True,
+        'message': 'Email verified and registration complete',
+        'patientId': registration['patient_id']
+    }), 201
 
 
 @users_bp.route('/api/patients/resend-verification', methods=['POST'])
@@ -266,125 +372,38 @@ def resend_verification():
         "email": "john@example.com"
     }
     """
-    try:
-        data = request.get_json()
-        email = data.get('email')
-        
-        if not email:
-            return jsonify({
-                'success': False,
-                'error': 'Email is required'
-            }), 400
-        
-        user_db = UserDB()
-        
+    data = g.body
+    email = data.get('email')
+    
+    if not email:
+        return error_response('Email is required', 400)
+    
+    with UserDB() as user_db:
         # Get pending verification
         verification = user_db.get_pending_verification(email)
-        
+    
         if not verification:
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'No pending verification found. Please register again.'
-            }), 404
-        
-        # Generate new code and update
-        email_service = EmailService()
+            return error_response('No pending verification found. Please register again.', 404)
+    
+        # Generate new code and update the pending record in place
         new_code = EmailService.generate_verification_code()
-        
-        # Create new verification with updated code
-        verification_data = {
-            'email': email,
-            'firstName': verification['first_name'],
-            'lastName': verification['last_name'],
-            'phone': verification['phone'],
-            'dateOfBirth': str(verification['date_of_birth']),
-            'pin': 'placeholder',  # Will be replaced with existing hash
-            'verification_code': new_code
-        }
-        
-        # Delete old and create new
-        user_db.delete_verification(email)
-        
-        # Need to recreate with original PIN hash - get from verification record
-        from db_config import DatabaseConnection
-        from mysql.connector import Error
-        import uuid
-        from datetime import datetime, timedelta
-        
-        try:
-            db = DatabaseConnection()
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            
-            verification_id = str(uuid.uuid4())
-            expires_at = datetime.now() + timedelta(minutes=10)
-            
-            query = """
-                INSERT INTO email_verifications (
-                    id, email, verification_code, pin, first_name, last_name, 
-                    phone, date_of_birth, expires_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            values = (
-                verification_id,
-                email,
-                new_code,
-                verification['pin'],  # Use existing hashed PIN
-                verification['first_name'],
-                verification['last_name'],
-                verification['phone'],
-                verification['date_of_birth'],
-                expires_at
-            )
-            
-            cursor.execute(query, values)
-            conn.commit()
-            cursor.close()
-            db.disconnect()
-            
-        except Error as e:
-            print(f"Error recreating verification: {e}")
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'Failed to resend verification'
-            }), 500
-        
-        # Send new verification email
-        # Note: We can't show the original PIN since it's hashed
-        email_sent = email_service.send_verification_email(
-            to_email=email,
-            first_name=verification['first_name'],
-            verification_code=new_code,
-            pin='******'  # Can't recover original PIN
-        )
-        
-        user_db.close()
-        
-        if email_sent:
-            return jsonify({
-                'success': True,
-                'message': 'New verification code sent'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to send verification email'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error resending verification: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
-        print(f"Error in patient registration: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+        if not user_db.update_verification_code(email, new_code):
+            return error_response('Failed to resend verification', 500)
+    
+    # Send new verification email in the background
+    # Note: We can't show the original PIN since it's hashed
+    email_executor.submit(
+        email_service.send_verification_email,
+        to_email=email,
+        first_name=verification['first_name'],
+        verification_code=new_code,
+        pin='******'  # Can't recover original PIN
+    )
+    
+    return jsonify({
+        'success': True,
+        'message': 'New verification code is being sent'
+    }), 202
 
 
 @users_bp.route('/api/patients/login', methods=['POST'])
@@ -398,121 +417,79 @@ def login_patient():
         "pin": "123456"
     }
     """
-    try:
-        data = request.get_json()
-        
-        email = data.get('email')
-        pin = data.get('pin')
-        
-        if not email or not pin:
-            return jsonify({
-                'success': False,
-                'error': 'Email and PIN are required'
-            }), 400
-        
-        user_db = UserDB()
+    data = g.body
+    
+    email = data.get('email')
+    pin = data.get('pin')
+    
+    if not email or not pin:
+        return error_response('Email and PIN are required', 400)
+    
+    attempt = login_attempt_key('patient', email, pin)
+    if is_known_failed_login(attempt):
+        return error_response('Invalid email or PIN', 401)
+    
+    with UserDB() as user_db:
         patient = user_db.verify_patient_pin(email, pin)
-        user_db.close()
-        
-        if patient:
-            # Convert date objects to strings for JSON serialization
-            if patient.get('date_of_birth'):
-                patient['date_of_birth'] = str(patient['date_of_birth'])
-            if patient.get('created_at'):
-                patient['created_at'] = str(patient['created_at'])
-            if patient.get('updated_at'):
-                patient['updated_at'] = str(patient['updated_at'])
-            
-            return jsonify({
-                'success': True,
-                'message': 'Login successful',
-                'patient': {
-                    'id': patient['id'],
-                    'firstName': patient['first_name'],
-                    'lastName': patient['last_name'],
-                    'email': patient['email'],
-                    'phone': patient['phone'],
-                    'dateOfBirth': patient['date_of_birth']
-                }
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid email or PIN'
-            }), 401
-            
-    except Exception as e:
-        print(f"Error in patient login: {e}")
+    
+    if patient:
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'message': 'Login successful',
+            'patient': patient
+        }), 200
+    else:
+        record_failed_login(attempt)
+        return error_response('Invalid email or PIN', 401)
 
 
 @users_bp.route('/api/patients', methods=['GET'])
 def get_all_patients():
     """Get all registered patients"""
-    try:
-        user_db = UserDB()
-        patients = user_db.get_all_patients()
-        user_db.close()
-        
-        # Convert date objects to strings
-        for patient in patients:
-            if patient.get('date_of_birth'):
-                patient['date_of_birth'] = str(patient['date_of_birth'])
-            if patient.get('created_at'):
-                patient['created_at'] = str(patient['created_at'])
-        
-        return jsonify({
-            'success': True,
-            'patients': patients
-        }), 200
-        
-    except Exception as e:
-        print(f"Error retrieving patients: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    body, generation = cached_listing('patients')
+    if body is not None:
+        return Response(body, status=200, mimetype='application/json')
+    
+    def generate():
+        # Stream rows as they arrive from the server; the joined body is
+        # cached only once the listing has been sent in full
+        with UserDB() as user_db:
+            rows = user_db.iter_all_patients()
+            row = next(rows, None)
+            yield b''
+            parts = [b'{"success":true,"patients":[']
+            yield parts[0]
+            while row is not None:
+                chunk = orjson.dumps(row)
+                if len(parts) > 1:
+                    chunk = b',' + chunk
+                parts.append(chunk)
+                yield chunk
+                row = next(rows, None)
+        parts.append(b']}')
+        yield parts[-1]
+        store_listing('patients', b''.join(parts), generation)
+    
+    # Connect and run the query before the 200 goes out, so those errors
+    # still reach the blueprint's JSON error handler
+    stream = generate()
+    next(stream)
+    return Response(stream_with_context(stream), status=200, mimetype='application/json')
 
 
 @users_bp.route('/api/patients/<patient_id>', methods=['GET'])
 def get_patient(patient_id):
     """Get a specific patient by ID"""
-    try:
-        user_db = UserDB()
+    with UserDB() as user_db:
         patient = user_db.get_patient_by_id(patient_id)
-        user_db.close()
-        
-        if patient:
-            # Remove sensitive data
-            patient.pop('pin', None)
-            
-            # Convert date objects
-            if patient.get('date_of_birth'):
-                patient['date_of_birth'] = str(patient['date_of_birth'])
-            if patient.get('created_at'):
-                patient['created_at'] = str(patient['created_at'])
-            if patient.get('updated_at'):
-                patient['updated_at'] = str(patient['updated_at'])
-            
-            return jsonify({
-                'success': True,
-                'patient': patient
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Patient not found'
-            }), 404
-            
-    except Exception as e:
-        print(f"Error retrieving patient: {e}")
+    
+    if patient:
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'patient': patient
+        }), 200
+    else:
+        return error_response('Patient not found', 404)
 
 
 @users_bp.route('/api/patients/<patient_id>', methods=['DELETE'])
@@ -527,44 +504,30 @@ def delete_patient_account(patient_id):
     - All doctor assignments
     - Email verification records
     """
-    try:
-        user_db = UserDB()
-        
+    with UserDB() as user_db:
         # Verify patient exists
         patient = user_db.get_patient_by_id(patient_id)
         if not patient:
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'Patient not found'
-            }), 404
-        
+            return error_response('Patient not found', 404)
+    
         # Delete patient and all related data
         success = user_db.delete_patient(patient_id)
-        user_db.close()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Account deleted successfully'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to delete account'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error deleting patient account: {e}")
+    
+    if success:
+        invalidate_listing('patients')
+        invalidate_fingerprint_status(patient['email'])
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'message': 'Account deleted successfully'
+        }), 200
+    else:
+        return error_response('Failed to delete account', 500)
 
 
 # ==================== DOCTOR ROUTES ====================
 
 @users_bp.route('/api/doctors/register', methods=['POST'])
+@validate_body(DOCTOR_REQUIRED_FIELDS, DOCTOR_CHECKS)
 def register_doctor():
     """
     Register a new doctor
@@ -577,72 +540,29 @@ def register_doctor():
         "password": "SecurePass@123"
     }
     """
+    data = g.body
+    
+    # Validate password strength
+    is_valid, error_msg = validate_password(data['password'])
+    if not is_valid:
+        return error_response(error_msg, 400)
+    
+    # Create doctor; the UNIQUE license_id key rejects duplicates
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['licenseId', 'fullName', 'specialization', 'password']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({
-                    'success': False,
-                    'error': f'{field} is required'
-                }), 400
-        
-        # Validate license ID (min 5 chars)
-        if len(data['licenseId']) < 5:
-            return jsonify({
-                'success': False,
-                'error': 'License ID must be at least 5 characters'
-            }), 400
-        
-        # Validate full name (min 3 chars)
-        if len(data['fullName']) < 3:
-            return jsonify({
-                'success': False,
-                'error': 'Full name must be at least 3 characters'
-            }), 400
-        
-        # Validate password strength
-        is_valid, error_msg = validate_password(data['password'])
-        if not is_valid:
-            return jsonify({
-                'success': False,
-                'error': error_msg
-            }), 400
-        
-        # Check if doctor already exists
-        user_db = UserDB()
-        
-        if user_db.doctor_exists(data['licenseId']):
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'A doctor with this license ID already exists'
-            }), 409
-        
-        # Create doctor
-        doctor_id = user_db.create_doctor(data)
-        user_db.close()
-        
-        if doctor_id:
-            return jsonify({
-                'success': True,
-                'message': 'Doctor registered successfully. Pending verification.',
-                'doctorId': doctor_id
-            }), 201
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to register doctor'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error in doctor registration: {e}")
+        with UserDB() as user_db:
+            doctor_id = user_db.create_doctor(data)
+    except DuplicateEntryError:
+        return error_response('A doctor with this license ID already exists', 409)
+    
+    if doctor_id:
+        invalidate_listing('doctors')
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'message': 'Doctor registered successfully. Pending verification.',
+            'doctorId': doctor_id
+        }), 201
+    else:
+        return error_response('Failed to register doctor', 500)
 
 
 @users_bp.route('/api/doctors/login', methods=['POST'])
@@ -656,78 +576,48 @@ def login_doctor():
         "password": "SecurePass@123"
     }
     """
-    try:
-        data = request.get_json()
-        
-        license_id = data.get('licenseId')
-        password = data.get('password')
-        
-        if not license_id or not password:
-            return jsonify({
-                'success': False,
-                'error': 'License ID and password are required'
-            }), 400
-        
-        user_db = UserDB()
+    data = g.body
+    
+    license_id = data.get('licenseId')
+    password = data.get('password')
+    
+    if not license_id or not password:
+        return error_response('License ID and password are required', 400)
+    
+    attempt = login_attempt_key('doctor', license_id, password)
+    if is_known_failed_login(attempt):
+        return error_response('Invalid license ID or password', 401)
+    
+    with UserDB() as user_db:
         doctor = user_db.verify_doctor_password(license_id, password)
-        user_db.close()
-        
-        if doctor:
-            # Convert datetime objects to strings
-            if doctor.get('created_at'):
-                doctor['created_at'] = str(doctor['created_at'])
-            if doctor.get('updated_at'):
-                doctor['updated_at'] = str(doctor['updated_at'])
-            
-            return jsonify({
-                'success': True,
-                'message': 'Login successful',
-                'doctor': {
-                    'id': doctor['id'],
-                    'licenseId': doctor['license_id'],
-                    'fullName': doctor['full_name'],
-                    'specialization': doctor['specialization'],
-                    'verified': doctor['verified']
-                }
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid license ID or password'
-            }), 401
-            
-    except Exception as e:
-        print(f"Error in doctor login: {e}")
+    
+    if doctor:
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'message': 'Login successful',
+            'doctor': doctor
+        }), 200
+    else:
+        record_failed_login(attempt)
+        return error_response('Invalid license ID or password', 401)
 
 
 @users_bp.route('/api/doctors', methods=['GET'])
 def get_all_doctors():
     """Get all registered doctors"""
-    try:
-        user_db = UserDB()
+    body, generation = cached_listing('doctors')
+    if body is not None:
+        return Response(body, status=200, mimetype='application/json')
+    
+    with UserDB() as user_db:
         doctors = user_db.get_all_doctors()
-        user_db.close()
-        
-        # Convert datetime objects
-        for doctor in doctors:
-            if doctor.get('created_at'):
-                doctor['created_at'] = str(doctor['created_at'])
-        
-        return jsonify({
-            'success': True,
-            'doctors': doctors
-        }), 200
-        
-    except Exception as e:
-        print(f"Error retrieving doctors: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    
+    response = jsonify({
+        'success': True,
+        'doctors': doctors
+    })
+    store_listing('doctors', response.get_data(), generation)
+    return response, 200
 
 
 @users_bp.route('/api/doctors/<doctor_id>', methods=['DELETE'])
@@ -740,102 +630,54 @@ def delete_doctor_account(doctor_id):
     - All consents granted by patients
     - All patient assignments
     """
-    try:
-        user_db = UserDB()
-        
+    with UserDB() as user_db:
         # Verify doctor exists
         doctor = user_db.get_doctor_by_id(doctor_id)
         if not doctor:
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'Doctor not found'
-            }), 404
-        
+            return error_response('Doctor not found', 404)
+    
         # Delete doctor and all related data
         success = user_db.delete_doctor(doctor_id)
-        user_db.close()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Account deleted successfully'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to delete account'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error deleting doctor account: {e}")
+    
+    if success:
+        invalidate_listing('doctors')
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'message': 'Account deleted successfully'
+        }), 200
+    else:
+        return error_response('Failed to delete account', 500)
 
 
 @users_bp.route('/api/doctors/<doctor_id>', methods=['GET'])
 def get_doctor(doctor_id):
     """Get a specific doctor by ID"""
-    try:
-        user_db = UserDB()
+    with UserDB() as user_db:
         doctor = user_db.get_doctor_by_id(doctor_id)
-        user_db.close()
-        
-        if doctor:
-            # Remove sensitive data
-            doctor.pop('password', None)
-            
-            # Convert datetime objects
-            if doctor.get('created_at'):
-                doctor['created_at'] = str(doctor['created_at'])
-            if doctor.get('updated_at'):
-                doctor['updated_at'] = str(doctor['updated_at'])
-            
-            return jsonify({
-                'success': True,
-                'doctor': doctor
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Doctor not found'
-            }), 404
-            
-    except Exception as e:
-        print(f"Error retrieving doctor: {e}")
+    
+    if doctor:
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'doctor': doctor
+        }), 200
+    else:
+        return error_response('Doctor not found', 404)
 
 
 @users_bp.route('/api/doctors/<doctor_id>/verify', methods=['POST'])
 def verify_doctor_account(doctor_id):
     """Mark a doctor as verified (admin only)"""
-    try:
-        user_db = UserDB()
+    with UserDB() as user_db:
         success = user_db.verify_doctor(doctor_id)
-        user_db.close()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Doctor verified successfully'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Doctor not found or already verified'
-            }), 404
-            
-    except Exception as e:
-        print(f"Error verifying doctor: {e}")
+    
+    if success:
+        invalidate_listing('doctors')
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'message': 'Doctor verified successfully'
+        }), 200
+    else:
+        return error_response('Doctor not found or already verified', 404)
 
 
 # ==================== FINGERPRINT/BIOMETRIC ROUTES ====================
@@ -852,50 +694,31 @@ def register_fingerprint():
         "publicKey": "base64-encoded-public-key"
     }
     """
-    try:
-        data = request.get_json()
-        
-        email = data.get('email')
-        credential_id = data.get('credentialId')
-        public_key = data.get('publicKey')
-        
-        if not email or not credential_id or not public_key:
-            return jsonify({
-                'success': False,
-                'error': 'Email, credentialId, and publicKey are required'
-            }), 400
-        
-        user_db = UserDB()
-        
+    data = g.body
+    
+    email = data.get('email')
+    credential_id = data.get('credentialId')
+    public_key = data.get('publicKey')
+    
+    if not email or not credential_id or not public_key:
+        return error_response('Email, credentialId, and publicKey are required', 400)
+    
+    with UserDB() as user_db:
         # Check if patient exists
         if not user_db.patient_exists(email):
-            user_db.close()
-            return jsonify({
-                'success': False,
-                'error': 'Patient not found'
-            }), 404
-        
+            return error_response('Patient not found', 404)
+    
         # Register fingerprint
         success = user_db.register_fingerprint(email, credential_id, public_key)
-        user_db.close()
-        
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Fingerprint registered successfully'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to register fingerprint'
-            }), 500
-            
-    except Exception as e:
-        print(f"Error registering fingerprint: {e}")
+    
+    if success:
+        invalidate_fingerprint_status(email)
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'message': 'Fingerprint registered successfully'
+        }), 200
+    else:
+        return error_response('Failed to register fingerprint', 500)
 
 
 @users_bp.route('/api/patients/fingerprint/challenge', methods=['POST'])
@@ -908,48 +731,32 @@ def get_fingerprint_challenge():
         "email": "patient@example.com"
     }
     """
-    try:
-        import base64
-        import secrets
-        
-        data = request.get_json()
-        email = data.get('email')
-        
-        if not email:
-            return jsonify({
-                'success': False,
-                'error': 'Email is required'
-            }), 400
-        
-        user_db = UserDB()
-        
+    data = g.body
+    email = data.get('email')
+    
+    if not email:
+        return error_response('Email is required', 400)
+    
+    with UserDB() as user_db:
         # Check if patient has fingerprint registered
         credential = user_db.get_fingerprint_credential(email)
-        user_db.close()
-        
-        if not credential:
-            return jsonify({
-                'success': False,
-                'error': 'No fingerprint registered for this account',
-                'fingerprintRegistered': False
-            }), 404
-        
-        # Generate a random challenge
-        challenge = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
-        
-        return jsonify({
-            'success': True,
-            'challenge': challenge,
-            'credentialId': credential['credential_id'],
-            'fingerprintRegistered': True
-        }), 200
-        
-    except Exception as e:
-        print(f"Error generating fingerprint challenge: {e}")
+    
+    if not credential:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'error': 'No fingerprint registered for this account',
+            'fingerprintRegistered': False
+        }), 404
+    
+    # Generate a random challenge
+    challenge = secrets.token_urlsafe(32)
+    
+    return jsonify({
+        'success': True,
+        'challenge': challenge,
+        'credentialId': credential['credential_id'],
+        'fingerprintRegistered': True
+    }), 200
 
 
 @users_bp.route('/api/patients/fingerprint/verify', methods=['POST'])
@@ -966,74 +773,50 @@ def verify_fingerprint():
         "clientDataJSON": "base64-encoded-client-data"
     }
     """
-    try:
-        data = request.get_json()
-        
-        email = data.get('email')
-        credential_id = data.get('credentialId')
-        
-        if not email or not credential_id:
-            return jsonify({
-                'success': False,
-                'error': 'Email and credentialId are required'
-            }), 400
-        
-        user_db = UserDB()
-        
+    data = g.body
+    
+    email = data.get('email')
+    credential_id = data.get('credentialId')
+    
+    if not email or not credential_id:
+        return error_response('Email and credentialId are required', 400)
+    
+    with UserDB() as user_db:
         # Verify the credential ID matches the stored one
         patient = user_db.verify_fingerprint_credential(email, credential_id)
-        user_db.close()
-        
-        if patient:
-            # Convert date objects to strings for JSON serialization
-            if patient.get('date_of_birth'):
-                patient['date_of_birth'] = str(patient['date_of_birth'])
-            
-            return jsonify({
-                'success': True,
-                'message': 'Fingerprint verified successfully',
-                'patient': {
-                    'id': patient['id'],
-                    'firstName': patient['first_name'],
-                    'lastName': patient['last_name'],
-                    'email': patient['email'],
-                    'phone': patient['phone'],
-                    'dateOfBirth': patient['date_of_birth']
-                }
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Fingerprint verification failed'
-            }), 401
-            
-    except Exception as e:
-        print(f"Error verifying fingerprint: {e}")
+    
+    if patient:
         return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+            'success': True,
+            'message': 'Fingerprint verified successfully',
+            'patient': dict(zip(PATIENT_VIEW_KEYS, PATIENT_VIEW(patient)))
+        }), 200
+    else:
+        return error_response('Fingerprint verification failed', 401)
 
 
 @users_bp.route('/api/patients/fingerprint/status/<email>', methods=['GET'])
 def get_fingerprint_status(email):
     """Check if a patient has fingerprint registered"""
-    try:
-        user_db = UserDB()
-        has_fingerprint = user_db.has_fingerprint_registered(email)
-        user_db.close()
-        
-        return jsonify({
-            'success': True,
-            'fingerprintRegistered': has_fingerprint
-        }), 200
-        
-    except Exception as e:
-        print(f"Error checking fingerprint status: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    with _fingerprint_status_lock:
+        has_fingerprint = _fingerprint_status.get(email)
+    
+    if has_fingerprint is None:
+        with UserDB() as user_db:
+            has_fingerprint = user_db.has_fingerprint_registered(email)
+        with _fingerprint_status_lock:
+            _fingerprint_status[email] = has_fingerprint
+    
+    return jsonify({
+        'success': True,
+        'fingerprintRegistered': has_fingerprint
+    }), 200
+
+
+@lru_cache(maxsize=4096)
+def webauthn_user_id(email: str) -> str:
+    """Stable unpadded base64url WebAuthn user handle for an email"""
+    return base64.urlsafe_b64encode(email.encode()).rstrip(b'=').decode('ascii')
 
 
 @users_bp.route('/api/patients/fingerprint/registration-options', methods=['POST'])
@@ -1048,60 +831,46 @@ def get_registration_options():
         "lastName": "Doe"
     }
     """
-    try:
-        import base64
-        import secrets
-        
-        data = request.get_json()
-        email = data.get('email')
-        first_name = data.get('firstName', '')
-        last_name = data.get('lastName', '')
-        
-        if not email:
-            return jsonify({
-                'success': False,
-                'error': 'Email is required'
-            }), 400
-        
-        # Generate a random challenge
-        challenge = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip('=')
-        
-        # Generate a user ID based on email
-        user_id = base64.urlsafe_b64encode(email.encode()).decode('utf-8').rstrip('=')
-        
-        # WebAuthn registration options
-        options = {
-            'challenge': challenge,
-            'rp': {
-                'name': 'HealthVault',
-                'id': None  # Will be set by frontend based on current domain
-            },
-            'user': {
-                'id': user_id,
-                'name': email,
-                'displayName': f"{first_name} {last_name}".strip() or email
-            },
-            'pubKeyCredParams': [
-                {'type': 'public-key', 'alg': -7},   # ES256
-                {'type': 'public-key', 'alg': -257}  # RS256
-            ],
-            'authenticatorSelection': {
-                'authenticatorAttachment': 'platform',  # Use platform authenticator (fingerprint)
-                'userVerification': 'required',
-                'residentKey': 'preferred'
-            },
-            'timeout': 60000,
-            'attestation': 'none'
-        }
-        
-        return jsonify({
-            'success': True,
-            'options': options
-        }), 200
-        
-    except Exception as e:
-        print(f"Error generating registration options: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    data = g.body
+    email = data.get('email')
+    first_name = data.get('firstName', '')
+    last_name = data.get('lastName', '')
+    
+    if not email:
+        return error_response('Email is required', 400)
+    
+    # Generate a random challenge
+    challenge = secrets.token_urlsafe(32)
+    
+    # Generate a user ID based on email
+    user_id = webauthn_user_id(email)
+    
+    # WebAuthn registration options
+    options = {
+        'challenge': challenge,
+        'rp': {
+            'name': 'HealthVault',
+            'id': None  # Will be set by frontend based on current domain
+        },
+        'user': {
+            'id': user_id,
+            'name': email,
+            'displayName': f"{first_name} {last_name}".strip() or email
+        },
+        'pubKeyCredParams': [
+            {'type': 'public-key', 'alg': -7},   # ES256
+            {'type': 'public-key', 'alg': -257}  # RS256
+        ],
+        'authenticatorSelection': {
+            'authenticatorAttachment': 'platform',  # Use platform authenticator (fingerprint)
+            'userVerification': 'required',
+            'residentKey': 'preferred'
+        },
+        'timeout': 60000,
+        'attestation': 'none'
+    }
+    
+    return jsonify({
+        'success': True,
+        'options': options
+    }), 200
@@ -34,7 +34,7 @@ CREATE TABLE IF NOT EXISTS medical_reports (
     recommendations TEXT,            -- Doctor's recommendations
     
     -- Raw text for reference
-    raw_text LONGTEXT,               -- Full extracted text from PDF
+    raw_text LONGBLOB,               -- Full extracted text from PDF (zlib-compressed UTF-8)
     
     -- Metadata
     upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -154,7 +154,10 @@ CREATE TABLE IF NOT EXISTS consents (
     FOREIGN KEY (patient_id) REFERENCES patients(id) ON DELETE CASCADE,
     FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE,
     INDEX idx_consent_patient (patient_id),
-    INDEX idx_consent_doctor (doctor_id)
+    INDEX idx_consent_doctor (doctor_id),
+    INDEX idx_consent_patient_created (patient_id, created_at),
+    INDEX idx_consent_doctor_active (doctor_id, active, created_at),
+    INDEX idx_consent_doctor_patient (doctor_id, patient_id, active)
 );
 
 -- Doctor-Patient assignments table
@@ -168,6 +171,8 @@ CREATE TABLE IF NOT EXISTS assignments (
     FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE,
     INDEX idx_assignment_doctor (doctor_id),
     INDEX idx_assignment_patient (patient_id),
+    INDEX idx_assignment_doctor_assigned (doctor_id, assigned_at),
+    INDEX idx_assignment_patient_assigned (patient_id, assigned_at),
     UNIQUE KEY unique_doctor_patient (doctor_id, patient_id)
 );
 
@@ -214,6 +219,7 @@ CREATE TABLE IF NOT EXISTS patient_reports (
     
     FOREIGN KEY (patient_id) REFERENCES patients(id) ON DELETE CASCADE,
     INDEX idx_report_patient (patient_id),
+    INDEX idx_report_patient_uploaded (patient_id, uploaded_at),
     INDEX idx_report_date (measurement_date),
     INDEX idx_report_status (status)
 );
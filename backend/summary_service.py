@@ -6,20 +6,35 @@ Run this alongside the main backend for AI summarization
 Port: 8004
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from PyPDF2 import PdfReader
+from cachetools import TTLCache
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
-import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+import hashlib
 import json
-import tempfile
+import logging
+import orjson
+import os
+import re
+import threading
+import tiktoken
 from datetime import datetime
 from db_config import MedicalReportDB
+from utils.pdf_processor import extract_pages
 
 # Load environment variables
 load_dotenv()
 
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 
 # Configure upload settings
@@ -28,100 +43,264 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 # Enable CORS for Node.js server calls
 CORS(app, origins=["http://localhost:5000", "http://localhost:3000", "*"])
 
-# Initialize database
-report_db = MedicalReportDB()
+
+# Gemini outputs keyed by (prompt, SHA-256 of the report text it was given).
+# Re-uploading the same report within the TTL skips the LLM round-trips.
+llm_cache = TTLCache(maxsize=int(os.getenv('LLM_CACHE_SIZE', 1024)), ttl=24 * 3600)
+llm_cache_lock = threading.Lock()
+
+# Reports submitted asynchronously are analyzed here; their progress lives
+# in medical_reports.processed_status so any worker can answer a poll
+report_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('REPORT_WORKERS', 4)),
+    thread_name_prefix='report-worker'
+)
+
+# Fields returned under "extracted_info", in response order
+EXTRACTED_INFO_FIELDS = (
+    'patient_name', 'patient_age', 'patient_gender', 'patient_id',
+    'report_date', 'report_type', 'hospital_name', 'doctor_name',
+    'diagnosis', 'key_findings', 'recommendations'
+)
+
+# Token budget for the report text sent to Gemini. Long reports keep their
+# beginning and their end, where recommendations usually are.
+PROMPT_HEAD_TOKENS = 2500
+PROMPT_TAIL_TOKENS = 1000
+
+# Report text averages well under this many characters per token, so
+# slicing by it first bounds tokenizer work on very long reports
+MAX_CHARS_PER_TOKEN = 8
 
 
 def extract_text_from_pdf(pdf_file):
-    """Extract text from a PDF file"""
-    text = ""
-    pdf_reader = PdfReader(pdf_file)
-    for page in pdf_reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            text += page_text
-    return text
+    """Extract text from an uploaded PDF entirely in memory"""
+    return "".join(extract_pages(pdf_file.read()))
 
 
-def extract_medical_info(raw_text: str) -> dict:
+@lru_cache(maxsize=1)
+def get_encoding():
     """
-    Use Gemini to extract structured medical information from the report text
-    """
-    extraction_prompt = f"""
-    Analyze the following medical report text and extract the information in JSON format.
-    If any information is not found, use null for that field.
+    Load the tokenizer once, on first use
     
-    Extract the following fields:
-    - patient_name: Full name of the patient
-    - patient_age: Age as a number
-    - patient_gender: Male, Female, or Other
-    - patient_id: Patient ID or registration number
-    - report_date: Date in YYYY-MM-DD format
-    - report_type: Type of medical report (e.g., Blood Test, X-Ray, MRI, CT Scan, Pathology, General Checkup)
-    - hospital_name: Name of the hospital or clinic
-    - doctor_name: Name of the doctor
-    - diagnosis: Main diagnosis or findings
-    - key_findings: Important observations (as a string)
-    - recommendations: Doctor's recommendations or advice
-    - test_results: Array of test results, each with:
-        - test_name: Name of the test
-        - test_value: Result value
-        - unit: Unit of measurement
-        - normal_range: Normal range for reference
-        - status: Normal, Abnormal, or Critical
+    cl100k_base is not Gemini's tokenizer but tracks its counts closely
+    enough for budgeting.
+    """
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def prompt_text(raw_text: str) -> str:
+    """Trim report text to the prompt token budget, keeping head and tail"""
+    encoding = get_encoding()
+    budget = PROMPT_HEAD_TOKENS + PROMPT_TAIL_TOKENS
     
-    Medical Report Text:
-    {raw_text[:15000]}
+    if len(raw_text) <= budget * MAX_CHARS_PER_TOKEN:
+        tokens = encoding.encode(raw_text, disallowed_special=())
+        if len(tokens) <= budget:
+            return raw_text
+        head, tail = tokens[:PROMPT_HEAD_TOKENS], tokens[-PROMPT_TAIL_TOKENS:]
+    else:
+        head = encoding.encode(
+            raw_text[:PROMPT_HEAD_TOKENS * MAX_CHARS_PER_TOKEN], disallowed_special=()
+        )[:PROMPT_HEAD_TOKENS]
+        tail = encoding.encode(
+            raw_text[-PROMPT_TAIL_TOKENS * MAX_CHARS_PER_TOKEN:], disallowed_special=()
+        )[-PROMPT_TAIL_TOKENS:]
     
-    Return ONLY valid JSON, no additional text or explanation.
+    return encoding.decode(head) + "\n...\n" + encoding.decode(tail)
+
+
+# Fixed instructions for each prompt. They are sent as the system
+# instruction so every request shares an identical prefix and only the
+# report text that follows it varies.
+EXTRACTION_FIELDS = """
+- patient_name: Full name of the patient
+- patient_age: Age as a number
+- patient_gender: Male, Female, or Other
+- patient_id: Patient ID or registration number
+- report_date: Date in YYYY-MM-DD format
+- report_type: Type of medical report (e.g., Blood Test, X-Ray, MRI, CT Scan, Pathology, General Checkup)
+- hospital_name: Name of the hospital or clinic
+- doctor_name: Name of the doctor
+- diagnosis: Main diagnosis or findings
+- key_findings: Important observations (as a string)
+- recommendations: Doctor's recommendations or advice
+- test_results: Array of test results, each with:
+    - test_name: Name of the test
+    - test_value: Result value
+    - unit: Unit of measurement
+    - normal_range: Normal range for reference
+    - status: Normal, Abnormal, or Critical
+"""
+
+SUMMARY_SECTIONS = """
+1. Patient Overview (demographics, reason for visit)
+2. Key Test Results and Values
+3. Main Diagnosis/Findings
+4. Notable Abnormalities (if any)
+5. Recommendations and Follow-up Actions
+"""
+
+EXTRACTION_INSTRUCTIONS = f"""
+Analyze the following medical report text and extract the information in JSON format.
+If any information is not found, use null for that field.
+
+Extract the following fields:
+{EXTRACTION_FIELDS}
+Return ONLY valid JSON, no additional text or explanation.
+"""
+
+SUMMARY_INSTRUCTIONS = f"""
+Generate a comprehensive medical summary from the following report text.
+The summary should include:
+{SUMMARY_SECTIONS}
+Keep the summary concise but informative (200-400 words).
+"""
+
+REPORT_INSTRUCTIONS = f"""
+Analyze the following medical report text and return a single JSON object
+with exactly two keys, "extracted_info" and "summary".
+
+"extracted_info" is an object with the following fields. If any information
+is not found, use null for that field.
+{EXTRACTION_FIELDS}
+"summary" is a string holding a comprehensive medical summary that includes:
+{SUMMARY_SECTIONS}
+Keep the summary concise but informative (200-400 words).
+
+Return ONLY valid JSON, no additional text or explanation.
+"""
+
+SUMMARY_FAILED = "Summary generation failed"
+
+
+def llm_cache_key(name: str, raw_text: str) -> tuple:
+    """llm_cache key for the result of prompt `name` on raw_text"""
+    return name, hashlib.sha256(raw_text.encode()).digest()
+
+
+def cache_llm_result(failed):
     """
+    Memoize a raw_text -> result LLM call in llm_cache
     
+    Results equal to `failed` (the function's fallback value after an
+    error) are not stored, so a transient Gemini failure is retried.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(raw_text: str):
+            key = llm_cache_key(func.__name__, raw_text)
+            with llm_cache_lock:
+                result = llm_cache.get(key)
+            if result is None:
+                result = func(raw_text)
+                if result != failed:
+                    with llm_cache_lock:
+                        llm_cache[key] = result
+            return result
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def get_model(temperature: float) -> ChatGoogleGenerativeAI:
+    """Create the Gemini client for a temperature once and reuse it"""
+    return ChatGoogleGenerativeAI(model="models/gemini-2.5-flash", temperature=temperature)
+
+
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.S)
+
+
+def parse_json_response(response_text: str):
+    """Parse the JSON object out of a Gemini reply, with or without a markdown code fence"""
+    match = JSON_OBJECT_RE.search(response_text)
+    if not match:
+        raise ValueError("No JSON object in model response")
+    return orjson.loads(match.group(0))
+
+
+@cache_llm_result(failed={})
+def extract_medical_info(raw_text: str) -> dict:
+    """
+    Use Gemini to extract structured medical information from the report text
+    """
     try:
-        model = ChatGoogleGenerativeAI(model="models/gemini-2.5-flash", temperature=0.1)
-        response = model.invoke(extraction_prompt)
-        response_text = response.content
-        
-        # Clean up the response to get valid JSON
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0]
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0]
-        
-        extracted_info = json.loads(response_text.strip())
-        return extracted_info
-    except Exception as e:
-        print(f"Error extracting medical info: {e}")
+        response = get_model(0.1).invoke([
+            ("system", EXTRACTION_INSTRUCTIONS),
+            ("human", f"Medical Report Text:\n{prompt_text(raw_text)}")
+        ])
+        return parse_json_response(response.content)
+    except Exception:
+        logger.exception("Error extracting medical info")
         return {}
 
 
+def summary_messages(raw_text: str) -> list:
+    """Chat messages for the summary prompt"""
+    return [
+        ("system", SUMMARY_INSTRUCTIONS),
+        ("human", f"Medical Report Text:\n{prompt_text(raw_text)}\n\nSummary:")
+    ]
+
+
+@cache_llm_result(failed=SUMMARY_FAILED)
 def generate_summary(raw_text: str) -> str:
     """
     Use Gemini to generate a comprehensive summary of the medical report
     """
-    summary_prompt = f"""
-    Generate a comprehensive medical summary from the following report text.
-    The summary should include:
-    1. Patient Overview (demographics, reason for visit)
-    2. Key Test Results and Values
-    3. Main Diagnosis/Findings
-    4. Notable Abnormalities (if any)
-    5. Recommendations and Follow-up Actions
+    try:
+        response = get_model(0.3).invoke(summary_messages(raw_text))
+        return response.content
+    except Exception:
+        logger.exception("Error generating summary")
+        return SUMMARY_FAILED
+
+
+def stream_summary(raw_text: str):
+    """
+    Yield the summary for raw_text piece by piece as Gemini produces it
     
-    Keep the summary concise but informative (200-400 words).
+    Shares llm_cache with generate_summary: a cached summary is yielded
+    whole, and a completed stream is stored for later calls.
+    """
+    key = llm_cache_key(generate_summary.__name__, raw_text)
+    with llm_cache_lock:
+        cached = llm_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
     
-    Medical Report Text:
-    {raw_text[:15000]}
+    parts = []
+    for chunk in get_model(0.3).stream(summary_messages(raw_text)):
+        if chunk.content:
+            parts.append(chunk.content)
+            yield chunk.content
     
-    Summary:
+    with llm_cache_lock:
+        llm_cache[key] = "".join(parts)
+
+
+@cache_llm_result(failed=({}, SUMMARY_FAILED))
+def analyze_report(raw_text: str) -> tuple:
     """
+    Use one Gemini call to extract structured information and summarize
+    
+    The report text is sent once instead of once per prompt, halving the
+    input tokens and round-trips of the full summary endpoint.
     
+    Returns:
+        Tuple of (extracted_info, summary)
+    """
     try:
-        model = ChatGoogleGenerativeAI(model="models/gemini-2.5-flash", temperature=0.3)
-        response = model.invoke(summary_prompt)
-        return response.content
-    except Exception as e:
-        print(f"Error generating summary: {e}")
-        return "Summary generation failed"
+        response = get_model(0.1).invoke([
+            ("system", REPORT_INSTRUCTIONS),
+            ("human", f"Medical Report Text:\n{prompt_text(raw_text)}")
+        ])
+        result = parse_json_response(response.content)
+        return result.get('extracted_info') or {}, result.get('summary') or SUMMARY_FAILED
+    except Exception:
+        logger.exception("Error analyzing report")
+        return {}, SUMMARY_FAILED
 
 
 @app.route('/api/health', methods=['GET'])
@@ -134,6 +313,93 @@ def health_check():
     })
 
 
+def wants_async() -> bool:
+    """True when the client asked for 202 + polling instead of a blocking call"""
+    return (
+        request.args.get('async', '').lower() in ('1', 'true')
+        or 'respond-async' in request.headers.get('Prefer', '')
+    )
+
+
+def summary_response(file_name, report_id, text_length, summary, extracted_info, processed_at) -> dict:
+    """Shape the /api/report/summary response body"""
+    info = {field: extracted_info.get(field) for field in EXTRACTED_INFO_FIELDS}
+    info['test_results'] = extracted_info.get('test_results') or []
+    return {
+        "success": True,
+        "file_name": file_name,
+        "report_id": report_id,  # MySQL report ID
+        "processed_at": processed_at,
+        "text_length": text_length,
+        "summary": summary,
+        "extracted_info": info
+    }
+
+
+def summarize_report(raw_text: str, file_name: str, report_id: str = None) -> dict:
+    """
+    Analyze report text, store the result and build the response body
+    
+    Without report_id a new report row is inserted. With the report_id of a
+    pending row (an async submission) that row is completed instead.
+    """
+    # Extract medical information and generate the summary in one call
+    extracted_info, summary = analyze_report(raw_text)
+    
+    # Save to MySQL database (same tables as Streamlit app)
+    report_db = MedicalReportDB()
+    try:
+        report_data = {
+            'file_name': file_name,
+            'patient_name': extracted_info.get('patient_name'),
+            'patient_age': extracted_info.get('patient_age'),
+            'patient_gender': extracted_info.get('patient_gender', 'Unknown'),
+            'patient_id': extracted_info.get('patient_id'),
+            'report_date': extracted_info.get('report_date'),
+            'report_type': extracted_info.get('report_type', 'Medical Report'),
+            'hospital_name': extracted_info.get('hospital_name'),
+            'doctor_name': extracted_info.get('doctor_name'),
+            'summary': summary if summary and summary != SUMMARY_FAILED else f"Report uploaded on {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+            'diagnosis': extracted_info.get('diagnosis'),
+            'key_findings': extracted_info.get('key_findings'),
+            'test_results': extracted_info.get('test_results', []),
+            'recommendations': extracted_info.get('recommendations'),
+            'raw_text': raw_text,  # Stored zlib-compressed for reference
+            'faiss_index_path': None  # Can be set if vector store is created
+        }
+        
+        if report_id is None:
+            # Save the report and its individual test results together
+            report_id = report_db.save_report_with_tests(report_data, extracted_info.get('test_results'))
+        elif not report_db.complete_report(report_id, report_data, extracted_info.get('test_results')):
+            report_db.mark_report_failed(report_id)
+        logger.info("Report saved to MySQL with ID: %s", report_id)
+        
+    except Exception:
+        logger.exception("Warning: Could not save to MySQL database")
+        # Continue without database save - still return the processed data
+    finally:
+        report_db.close()
+    
+    return summary_response(
+        file_name, report_id, len(raw_text), summary, extracted_info,
+        datetime.now().isoformat()
+    )
+
+
+def run_summary_job(report_id: str, raw_text: str, file_name: str):
+    """Process an async submission on report_executor"""
+    try:
+        summarize_report(raw_text, file_name, report_id)
+    except Exception:
+        logger.exception("Error processing queued report %s", report_id)
+        report_db = MedicalReportDB()
+        try:
+            report_db.mark_report_failed(report_id)
+        finally:
+            report_db.close()
+
+
 @app.route('/api/report/summary', methods=['POST'])
 def get_report_summary():
     """
@@ -144,7 +410,9 @@ def get_report_summary():
         - Raw text in JSON body ({"text": "report text here"})
     
     Returns:
-        JSON with extracted information and summary
+        JSON with extracted information and summary, or with ?async=1 (or
+        "Prefer: respond-async") a 202 with the report_id to poll at
+        /api/report/summary/<report_id>
     """
     try:
         raw_text = None
@@ -167,16 +435,8 @@ def get_report_summary():
             
             file_name = file.filename
             
-            # Save to temp file and extract text
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                file.save(tmp.name)
-                tmp_path = tmp.name
-            
-            try:
-                with open(tmp_path, 'rb') as f:
-                    raw_text = extract_text_from_pdf(f)
-            finally:
-                os.unlink(tmp_path)  # Clean up temp file
+            # Extract straight from the upload stream; nothing touches disk
+            raw_text = extract_text_from_pdf(file)
         
         # Check if raw text was provided in JSON body
         elif request.is_json:
@@ -196,82 +456,82 @@ def get_report_summary():
                 "error": "No text could be extracted from the report"
             }), 400
         
-        # Extract medical information
-        extracted_info = extract_medical_info(raw_text)
-        
-        # Generate summary
-        summary = generate_summary(raw_text)
-        
-        # Save to MySQL database (same tables as Streamlit app)
-        report_id = None
-        try:
-            report_data = {
-                'file_name': file_name,
-                'patient_name': extracted_info.get('patient_name'),
-                'patient_age': extracted_info.get('patient_age'),
-                'patient_gender': extracted_info.get('patient_gender', 'Unknown'),
-                'patient_id': extracted_info.get('patient_id'),
-                'report_date': extracted_info.get('report_date'),
-                'report_type': extracted_info.get('report_type', 'Medical Report'),
-                'hospital_name': extracted_info.get('hospital_name'),
-                'doctor_name': extracted_info.get('doctor_name'),
-                'summary': summary if summary and summary != "Summary generation failed" else f"Report uploaded on {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-                'diagnosis': extracted_info.get('diagnosis'),
-                'key_findings': extracted_info.get('key_findings'),
-                'test_results': extracted_info.get('test_results', []),
-                'recommendations': extracted_info.get('recommendations'),
-                'raw_text': raw_text[:65000],  # Store raw text for reference
-                'faiss_index_path': None  # Can be set if vector store is created
-            }
+        if wants_async():
+            # Queue the LLM and database work; the client polls the status URL
+            report_db = MedicalReportDB()
+            try:
+                report_id = report_db.create_pending_report(file_name)
+            finally:
+                report_db.close()
             
-            report_id = report_db.save_report(report_data)
-            print(f"Report saved to MySQL with ID: {report_id}")
+            if not report_id:
+                return jsonify({
+                    "success": False,
+                    "error": "Could not queue the report for processing"
+                }), 500
             
-            # Save individual test results if available
-            if extracted_info.get('test_results') and report_id:
-                report_db.save_test_results(report_id, extracted_info.get('test_results'))
-                print(f"Test results saved for report: {report_id}")
-                
-        except Exception as db_error:
-            print(f"Warning: Could not save to MySQL database: {db_error}")
-            # Continue without database save - still return the processed data
-        
-        # Build response
-        response_data = {
-            "success": True,
-            "file_name": file_name,
-            "report_id": report_id,  # MySQL report ID
-            "processed_at": datetime.now().isoformat(),
-            "text_length": len(raw_text),
-            "summary": summary,
-            "extracted_info": {
-                "patient_name": extracted_info.get('patient_name'),
-                "patient_age": extracted_info.get('patient_age'),
-                "patient_gender": extracted_info.get('patient_gender'),
-                "patient_id": extracted_info.get('patient_id'),
-                "report_date": extracted_info.get('report_date'),
-                "report_type": extracted_info.get('report_type'),
-                "hospital_name": extracted_info.get('hospital_name'),
-                "doctor_name": extracted_info.get('doctor_name'),
-                "diagnosis": extracted_info.get('diagnosis'),
-                "key_findings": extracted_info.get('key_findings'),
-                "recommendations": extracted_info.get('recommendations'),
-                "test_results": extracted_info.get('test_results', [])
-            }
-        }
+            report_executor.submit(run_summary_job, report_id, raw_text, file_name)
+            return jsonify({
+                "success": True,
+                "status": "pending",
+                "report_id": report_id,
+                "status_url": f"/api/report/summary/{report_id}"
+            }), 202
         
-        return jsonify(response_data), 200
+        return jsonify(summarize_report(raw_text, file_name)), 200
     
     except Exception as e:
-        print(f"Error processing report: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error processing report")
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
 
+@app.route('/api/report/summary/<report_id>', methods=['GET'])
+def get_report_summary_status(report_id):
+    """
+    Poll an asynchronous /api/report/summary submission
+    
+    Returns 202 while the report is pending, the same body as a blocking
+    /api/report/summary call once it is processed, and an error once it
+    has failed.
+    """
+    report_db = MedicalReportDB()
+    try:
+        report = report_db.get_report_by_id(report_id)
+    finally:
+        report_db.close()
+    
+    if not report:
+        return jsonify({"success": False, "error": "Report not found"}), 404
+    
+    status = report.get('processed_status')
+    if status == 'pending':
+        return jsonify({"success": True, "status": "pending", "report_id": report_id}), 202
+    if status == 'failed':
+        return jsonify({
+            "success": False,
+            "status": "failed",
+            "report_id": report_id,
+            "error": "Report processing failed"
+        }), 200
+    
+    extracted_info = dict(report)
+    if extracted_info.get('report_date'):
+        extracted_info['report_date'] = extracted_info['report_date'].isoformat()
+    extracted_info['test_results'] = json.loads(report.get('test_results') or '[]')
+    
+    return jsonify(summary_response(
+        report.get('file_name'),
+        report_id,
+        len(report.get('raw_text') or ''),
+        report.get('summary'),
+        extracted_info,
+        report['last_updated'].isoformat() if report.get('last_updated') else None
+    )), 200
+
+
 @app.route('/api/report/extract', methods=['POST'])
 def extract_info_only():
     """
@@ -286,15 +546,8 @@ def extract_info_only():
             if file.filename == '' or not file.filename.lower().endswith('.pdf'):
                 return jsonify({"success": False, "error": "Invalid file"}), 400
             
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                file.save(tmp.name)
-                tmp_path = tmp.name
-            
-            try:
-                with open(tmp_path, 'rb') as f:
-                    raw_text = extract_text_from_pdf(f)
-            finally:
-                os.unlink(tmp_path)
+            # Extract straight from the upload stream; nothing touches disk
+            raw_text = extract_text_from_pdf(file)
         
         elif request.is_json:
             raw_text = request.get_json().get('text', '')
@@ -326,15 +579,8 @@ def summarize_only():
             if file.filename == '' or not file.filename.lower().endswith('.pdf'):
                 return jsonify({"success": False, "error": "Invalid file"}), 400
             
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                file.save(tmp.name)
-                tmp_path = tmp.name
-            
-            try:
-                with open(tmp_path, 'rb') as f:
-                    raw_text = extract_text_from_pdf(f)
-            finally:
-                os.unlink(tmp_path)
+            # Extract straight from the upload stream; nothing touches disk
+            raw_text = extract_text_from_pdf(file)
         
         elif request.is_json:
             raw_text = request.get_json().get('text', '')
@@ -353,11 +599,62 @@ def summarize_only():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format one server-sent event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@app.route('/api/report/summarize/stream', methods=['POST'])
+def summarize_stream():
+    """
+    Stream the summary as server-sent events while Gemini generates it
+    
+    Accepts the same input as /api/report/summarize. Emits one
+    `data: {"t": "<text>"}` event per chunk, then an `event: done` event,
+    or an `event: error` event if generation fails mid-stream.
+    """
+    raw_text = None
+    
+    if 'file' in request.files:
+        file = request.files['file']
+        if file.filename == '' or not file.filename.lower().endswith('.pdf'):
+            return jsonify({"success": False, "error": "Invalid file"}), 400
+        
+        # The upload has to be read before the response starts streaming
+        raw_text = extract_text_from_pdf(file)
+    
+    elif request.is_json:
+        raw_text = request.get_json().get('text', '')
+    
+    if not raw_text:
+        return jsonify({"success": False, "error": "No text provided"}), 400
+    
+    def generate():
+        try:
+            for text in stream_summary(raw_text):
+                yield sse_event({"t": text})
+            yield sse_event({}, event="done")
+        except Exception:
+            logger.exception("Error streaming summary")
+            yield sse_event({"error": "Summary generation failed"}, event="error")
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 if __name__ == '__main__':
     print("Starting Medical Report Summary API...")
     print("Endpoints:")
     print("  GET  /api/health          - Health check")
     print("  POST /api/report/summary  - Full summary with extraction")
+    print("  GET  /api/report/summary/<report_id> - Poll an async summary")
     print("  POST /api/report/extract  - Extract structured info only")
     print("  POST /api/report/summarize - Generate summary only")
-    app.run(debug=True, host='0.0.0.0', port=8004)
+    print("  POST /api/report/summarize/stream - Stream the summary (SSE)")
+    # Development server only; production runs under gunicorn with
+    # gunicorn.conf.py
+    app.run(debug=os.getenv('FLASK_ENV') == 'development', host='0.0.0.0', port=8004)
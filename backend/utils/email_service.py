@@ -9,54 +9,21 @@ from email.mime.multipart import MIMEMultipart
 import os
 import random
 import string
+import threading
+import time
 from dotenv import load_dotenv
 import logging
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Servers typically drop an idle SMTP session after about a minute, so an
+# older connection is replaced instead of reused
+SMTP_IDLE_TIMEOUT = 60
 
-class EmailService:
-    """Email service for sending verification codes"""
-    
-    def __init__(self):
-        self.smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-        self.smtp_port = int(os.getenv("SMTP_PORT", 587))
-        self.smtp_user = os.getenv("SMTP_USER", "")
-        self.smtp_password = os.getenv("SMTP_PASSWORD", "")
-        self.from_email = os.getenv("FROM_EMAIL", self.smtp_user)
-        self.from_name = os.getenv("FROM_NAME", "HealthVault")
-    
-    @staticmethod
-    def generate_verification_code(length: int = 6) -> str:
-        """Generate a random numeric verification code"""
-        return ''.join(random.choices(string.digits, k=length))
-    
-    def send_verification_email(self, to_email: str, first_name: str, verification_code: str, pin: str) -> bool:
-        """
-        Send verification email with the code and PIN reminder
-        
-        Parameters:
-        - to_email: Recipient email address
-        - first_name: User's first name for personalization
-        - verification_code: 6-digit verification code
-        - pin: User's chosen PIN (masked for security)
-        
-        Returns:
-        - True if email sent successfully, False otherwise
-        """
-        try:
-            # Create message
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = f"HealthVault - Email Verification Code: {verification_code}"
-            msg["From"] = f"{self.from_name} <{self.from_email}>"
-            msg["To"] = to_email
-            
-            # Mask the PIN (show first and last digit)
-            masked_pin = f"{pin[0]}****{pin[-1]}" if len(pin) >= 2 else "******"
-            
-            # Plain text version
-            text_content = f"""
+# Message templates live at module level; each send only fills in the
+# placeholders
+VERIFICATION_TEXT_TEMPLATE = """
 Hello {first_name},
 
 Welcome to HealthVault! To complete your registration, please verify your email address.
@@ -73,9 +40,8 @@ If you didn't create a HealthVault account, please ignore this email.
 Best regards,
 The HealthVault Team
             """
-            
-            # HTML version
-            html_content = f"""
+
+VERIFICATION_HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -135,50 +101,8 @@ The HealthVault Team
 </body>
 </html>
             """
-            
-            # Attach both versions
-            part1 = MIMEText(text_content, "plain")
-            part2 = MIMEText(html_content, "html")
-            msg.attach(part1)
-            msg.attach(part2)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-            
-            logger.info(f"Verification email sent successfully to {to_email}")
-            return True
-            
-        except smtplib.SMTPAuthenticationError as e:
-            logger.error(f"SMTP Authentication failed: {e}")
-            return False
-        except smtplib.SMTPException as e:
-            logger.error(f"SMTP error sending email: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Error sending verification email: {e}")
-            return False
-    
-    def send_welcome_email(self, to_email: str, first_name: str) -> bool:
-        """
-        Send a welcome email after successful registration
-        
-        Parameters:
-        - to_email: Recipient email address
-        - first_name: User's first name
-        
-        Returns:
-        - True if email sent successfully, False otherwise
-        """
-        try:
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = "Welcome to HealthVault! 🎉"
-            msg["From"] = f"{self.from_name} <{self.from_email}>"
-            msg["To"] = to_email
-            
-            html_content = f"""
+
+WELCOME_HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -220,13 +144,153 @@ The HealthVault Team
 </body>
 </html>
             """
+
+
+class EmailService:
+    """Email service for sending verification codes"""
+    
+    def __init__(self):
+        self.smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
+        self.smtp_port = int(os.getenv("SMTP_PORT", 587))
+        self.smtp_user = os.getenv("SMTP_USER", "")
+        self.smtp_password = os.getenv("SMTP_PASSWORD", "")
+        self.from_email = os.getenv("FROM_EMAIL", self.smtp_user)
+        self.from_name = os.getenv("FROM_NAME", "HealthVault")
+        
+        # One authenticated connection is shared by all sends; the lock
+        # serializes use of it across email worker threads
+        self._smtp = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Open and authenticate a new SMTP session"""
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+        server.starttls()
+        server.login(self.smtp_user, self.smtp_password)
+        return server
+    
+    def _close(self):
+        """Drop the shared connection, ignoring errors from a dead socket"""
+        server, self._smtp = self._smtp, None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+    
+    def _send(self, msg):
+        """
+        Send a message over the shared connection
+        
+        Connects on first use, replaces a connection idle for longer than
+        SMTP_IDLE_TIMEOUT, and reconnects once if the server has already
+        closed the session.
+        """
+        with self._lock:
+            if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT:
+                self._close()
+            
+            for attempt in range(2):
+                if self._smtp is None:
+                    self._smtp = self._connect()
+                try:
+                    self._smtp.send_message(msg)
+                    break
+                except smtplib.SMTPServerDisconnected:
+                    self._smtp = None
+                    if attempt:
+                        raise
+                except Exception:
+                    self._close()
+                    raise
+            
+            self._last_used = time.monotonic()
+    
+    @staticmethod
+    def generate_verification_code(length: int = 6) -> str:
+        """Generate a random numeric verification code"""
+        return ''.join(random.choices(string.digits, k=length))
+    
+    def send_verification_email(self, to_email: str, first_name: str, verification_code: str, pin: str) -> bool:
+        """
+        Send verification email with the code and PIN reminder
+        
+        Parameters:
+        - to_email: Recipient email address
+        - first_name: User's first name for personalization
+        - verification_code: 6-digit verification code
+        - pin: User's chosen PIN (masked for security)
+        
+        Returns:
+        - True if email sent successfully, False otherwise
+        """
+        try:
+            # Create message
+            msg = MIMEMultipart("alternative")
+            msg["Subject"] = f"HealthVault - Email Verification Code: {verification_code}"
+            msg["From"] = f"{self.from_name} <{self.from_email}>"
+            msg["To"] = to_email
+            
+            # Mask the PIN (show first and last digit)
+            masked_pin = f"{pin[0]}****{pin[-1]}" if len(pin) >= 2 else "******"
+            
+            fields = {
+                "first_name": first_name,
+                "verification_code": verification_code,
+                "masked_pin": masked_pin
+            }
+            
+            # Plain text version
+            text_content = VERIFICATION_TEXT_TEMPLATE.format_map(fields)
+            
+            # HTML version
+            html_content = VERIFICATION_HTML_TEMPLATE.format_map(fields)
+            
+            # Attach both versions
+            part1 = MIMEText(text_content, "plain")
+            part2 = MIMEText(html_content, "html")
+            msg.attach(part1)
+            msg.attach(part2)
+            
+            # Send email over the shared connection
+            self._send(msg)
+            
+            logger.info(f"Verification email sent successfully to {to_email}")
+            return True
+            
+        except smtplib.SMTPAuthenticationError as e:
+            logger.error(f"SMTP Authentication failed: {e}")
+            return False
+        except smtplib.SMTPException as e:
+            logger.error(f"SMTP error sending email: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Error sending verification email: {e}")
+            return False
+    
+    def send_welcome_email(self, to_email: str, first_name: str) -> bool:
+        """
+        Send a welcome email after successful registration
+        
+        Parameters:
+        - to_email: Recipient email address
+        - first_name: User's first name
+        
+        Returns:
+        - True if email sent successfully, False otherwise
+        """
+        try:
+            msg = MIMEMultipart("alternative")
+            msg["Subject"] = "Welcome to HealthVault! 🎉"
+            msg["From"] = f"{self.from_name} <{self.from_email}>"
+            msg["To"] = to_email
+            
+            html_content = WELCOME_HTML_TEMPLATE.format_map({"first_name": first_name})
             
             msg.attach(MIMEText(html_content, "html"))
             
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
+            self._send(msg)
             
             logger.info(f"Welcome email sent to {to_email}")
             return True
@@ -1,34 +1,225 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
-from langchain.chains.question_answering import load_qa_chain
-import json
+from sentence_transformers import SentenceTransformer
+from cachetools import LRUCache
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from typing import List, Optional
+import faiss
+import hashlib
+import numpy as np
+import onnxruntime
+import orjson
 import logging
 import os
+import pickle
+import re
+import threading
+import torch
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass(slots=True)
+class MedicalInfo:
+    """Structured medical information extracted from a report"""
+    patient_name: Optional[str] = None
+    patient_age: Optional[int] = None
+    patient_gender: Optional[str] = None
+    patient_id: Optional[str] = None
+    report_date: Optional[str] = None
+    report_type: Optional[str] = None
+    hospital_name: Optional[str] = None
+    doctor_name: Optional[str] = None
+    diagnosis: Optional[str] = None
+    key_findings: Optional[str] = None
+    recommendations: Optional[str] = None
+    test_results: List[dict] = field(default_factory=list)
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "MedicalInfo":
+        """Build from the model's JSON output, ignoring unknown keys"""
+        info = cls(**{name: data.get(name) for name in _MEDICAL_INFO_FIELDS})
+        if not info.test_results:
+            info.test_results = []
+        return info
+
+
+_MEDICAL_INFO_FIELDS = tuple(f.name for f in fields(MedicalInfo))
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BATCH_SIZE = 64
+
+# Int8 ONNX export shipped with the model; VNNI kernels run the quantized GEMMs on CPU
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+
+# ONNX Runtime intra-op threads per process; 0 lets it use every physical core.
+# Lower it when several worker processes share one machine.
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))
+
+# Vectors of recently embedded texts; report boilerplate repeats across uploads
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 100_000))
+
+# All report indexes live under one directory instead of the working directory
+FAISS_INDEX_DIR = os.getenv("FAISS_INDEX_DIR", "faiss_indexes")
+
+# Loaded stores keyed by (path, index mtime), so reprocessing a report misses the cache
+VECTOR_STORE_CACHE_SIZE = int(os.getenv("VECTOR_STORE_CACHE_SIZE", 64))
+_vector_stores = LRUCache(maxsize=VECTOR_STORE_CACHE_SIZE)
+_vector_store_lock = threading.Lock()
+
+QA_PROMPT_TEMPLATE = """
+        Answer the question in detail from the provided context.
+        If answer not in context, say "Answer not available in the context".
+        Don't provide wrong information.
+        
+        Context:
+        {context}
+        
+        Question:
+        {question}
+        
+        Answer:
+        """
+
+# Outermost {...} in a model reply, whether or not it is wrapped in a code fence
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.S)
+
+# Most report text sent in one Gemini prompt
+PROMPT_CHAR_BUDGET = 15000
+
+# Retrieval queries used to pick prompt text from reports longer than the budget
+PROMPT_FIELD_CUES = (
+    "patient name age gender patient id",
+    "report date report type hospital doctor",
+    "test results values units normal range",
+    "diagnosis key findings impression recommendations",
+)
+PROMPT_CHUNKS_PER_CUE = 4
+
+# Set SQ8_ENABLED=0 to build full-precision flat indexes when comparing recall
+SQ8_ENABLED = os.getenv("SQ8_ENABLED", "1") != "0"
+
+# SQ8 searches fetch RERANK_OVERFETCH * k candidates, then rerank them against
+# the float32 vectors saved next to the index
+RERANK_VECTORS_FILE = "vectors.npy"
+RERANK_OVERFETCH = 4
+
+
+def _embedding_model_kwargs() -> dict:
+    """Pick the embedding device: EMBEDDINGS_DEVICE env var, else CUDA when available"""
+    device = os.getenv("EMBEDDINGS_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+    model_kwargs = {"device": device}
+    if device.startswith("cuda"):
+        # Half precision halves memory traffic on GPU with no practical recall loss
+        model_kwargs["model_kwargs"] = {"torch_dtype": torch.float16}
+    return model_kwargs
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    LangChain embeddings backed by the ONNX Runtime build of MiniLM
+    
+    Drop-in for HuggingFaceEmbeddings on CPU, where the int8 export is
+    several times cheaper per chunk than the PyTorch float32 path.
+    """
+    
+    def __init__(self, model_name: str = EMBEDDING_MODEL, file_name: str = EMBEDDING_ONNX_FILE):
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = EMBEDDING_THREADS
+        self.model = SentenceTransformer(
+            model_name,
+            backend="onnx",
+            model_kwargs={"file_name": file_name, "session_options": session_options}
+        )
+        self._cache = LRUCache(maxsize=EMBEDDING_CACHE_SIZE)
+        self._cache_lock = threading.Lock()
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Normalized float32 embeddings as one contiguous array
+        
+        Texts embedded before (keyed by a BLAKE2b digest) come from the
+        cache; only the misses go through the model.
+        """
+        keys = [hashlib.blake2b(text.encode(), digest_size=16).digest() for text in texts]
+        with self._cache_lock:
+            vectors = [self._cache.get(key) for key in keys]
+        
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            fresh = self.model.encode(
+                [texts[i] for i in misses],
+                batch_size=EMBEDDING_BATCH_SIZE,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            ).astype("float32", copy=False)
+            with self._cache_lock:
+                for i, vector in zip(misses, fresh):
+                    vectors[i] = self._cache[keys[i]] = vector.copy()
+        
+        if not vectors:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype="float32")
+        return np.vstack(vectors)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> Embeddings:
+    """
+    Load the embedding model once per process and share it across requests
+    
+    Routes build a RAGProcessor per request; without this each one reloaded
+    the MiniLM weights and tokenizer. Int8 ONNX on CPU, PyTorch on GPU.
+    """
+    try:
+        model_kwargs = _embedding_model_kwargs()
+        if model_kwargs["device"] == "cpu":
+            embeddings = OnnxEmbeddings()
+            logger.info(f"ONNX embeddings initialized from {EMBEDDING_ONNX_FILE}")
+            return embeddings
+        
+        embeddings = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs=model_kwargs,
+            encode_kwargs={
+                "batch_size": EMBEDDING_BATCH_SIZE,
+                "normalize_embeddings": True
+            }
+        )
+        logger.info(f"HuggingFace embeddings initialized on {model_kwargs['device']}")
+        return embeddings
+    except Exception as e:
+        logger.error(f"Error initializing embeddings: {str(e)}")
+        raise
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(temperature: float) -> ChatGoogleGenerativeAI:
+    """Create the Gemini client for a temperature once and share it across requests"""
+    return ChatGoogleGenerativeAI(
+        model="models/gemini-2.5-flash",
+        temperature=temperature
+    )
+
+
 class RAGProcessor:
     """Handle RAG pipeline operations"""
     
     def __init__(self):
-        self.embeddings = None
+        self.embeddings = get_embeddings()
         self.vector_store = None
-        self.chain = None
-        self._initialize_embeddings()
-    
-    def _initialize_embeddings(self):
-        """Initialize HuggingFace embeddings"""
-        try:
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2"
-            )
-            logger.info("HuggingFace embeddings initialized successfully")
-        except Exception as e:
-            logger.error(f"Error initializing embeddings: {str(e)}")
-            raise
     
     def create_vector_store(self, text_chunks: list, faiss_path: str = None) -> str:
         """
@@ -46,9 +237,15 @@ class RAGProcessor:
             
             if not faiss_path:
                 faiss_path = "faiss_index"
+            if not os.path.dirname(faiss_path):
+                faiss_path = os.path.join(FAISS_INDEX_DIR, faiss_path)
             
-            vector_store = FAISS.from_texts(text_chunks, embedding=self.embeddings)
+            vectors = self._embed_chunks(text_chunks)
+            vector_store = self._build_quantized_store(text_chunks, vectors)
             vector_store.save_local(faiss_path)
+            if SQ8_ENABLED:
+                np.save(os.path.join(faiss_path, RERANK_VECTORS_FILE), vectors)
+            self.vector_store = vector_store
             
             logger.info(f"Vector store saved to {faiss_path}")
             return faiss_path
@@ -57,21 +254,125 @@ class RAGProcessor:
             logger.error(f"Error creating vector store: {str(e)}")
             raise
     
+    def _embed_chunks(self, text_chunks: list) -> np.ndarray:
+        """Normalized float32 chunk embeddings"""
+        if isinstance(self.embeddings, OnnxEmbeddings):
+            return self.embeddings.encode(text_chunks)
+        return np.asarray(self.embeddings.embed_documents(text_chunks), dtype="float32")
+    
+    def _build_quantized_store(self, text_chunks: list, vectors: np.ndarray) -> FAISS:
+        """
+        Build a FAISS store with 8-bit scalar-quantized vectors
+        
+        Embeddings are normalized, so inner product equals cosine similarity.
+        SQ8 stores one byte per dimension instead of four; a report has too
+        few chunks to train an IVF quantizer, so a flat SQ index is used.
+        """
+        if SQ8_ENABLED:
+            index = faiss.IndexScalarQuantizer(
+                vectors.shape[1],
+                faiss.ScalarQuantizer.QT_8bit,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(vectors)
+        else:
+            index = faiss.IndexFlatIP(vectors.shape[1])
+        
+        vector_store = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+        vector_store.add_embeddings(zip(text_chunks, vectors.tolist()))
+        return vector_store
+    
     def load_vector_store(self, faiss_path: str):
-        """Load existing FAISS vector store"""
+        """
+        Load existing FAISS vector store
+        
+        Chat turns on the same report reuse the store loaded by the first
+        one until the index file is rewritten.
+        """
         try:
-            self.vector_store = FAISS.load_local(
-                faiss_path,
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
-            logger.info(f"Vector store loaded from {faiss_path}")
+            key = (faiss_path, os.path.getmtime(os.path.join(faiss_path, "index.faiss")))
+            with _vector_store_lock:
+                vector_store = _vector_stores.get(key)
+                if vector_store is None:
+                    vector_store = self._read_vector_store(faiss_path)
+                    _vector_stores[key] = vector_store
+            
+            self.vector_store = vector_store
             return self.vector_store
         except Exception as e:
             logger.error(f"Error loading vector store: {str(e)}")
             raise
     
-    def extract_medical_info(self, raw_text: str) -> dict:
+    def _read_vector_store(self, faiss_path: str) -> FAISS:
+        """
+        Read the layout written by FAISS.save_local, picking the distance
+        strategy from the saved index's metric
+        """
+        index = faiss.read_index(os.path.join(faiss_path, "index.faiss"))
+        with open(os.path.join(faiss_path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        
+        # Older indexes are L2 flat; quantized ones use inner product
+        distance_strategy = (
+            DistanceStrategy.MAX_INNER_PRODUCT
+            if index.metric_type == faiss.METRIC_INNER_PRODUCT
+            else DistanceStrategy.EUCLIDEAN_DISTANCE
+        )
+        
+        vector_store = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+            distance_strategy=distance_strategy
+        )
+        logger.info(f"Vector store loaded from {faiss_path}")
+        return vector_store
+    
+    def _prompt_text(self, raw_text: str) -> str:
+        """
+        Report text for a Gemini prompt, at most PROMPT_CHAR_BUDGET characters
+        
+        Reports within the budget are sent whole. Longer ones are built from
+        the chunks that best match PROMPT_FIELD_CUES in this report's vector
+        store, in document order, instead of cutting off everything after
+        the first PROMPT_CHAR_BUDGET characters.
+        """
+        if len(raw_text) <= PROMPT_CHAR_BUDGET or self.vector_store is None:
+            return raw_text[:PROMPT_CHAR_BUDGET]
+        
+        try:
+            results = [
+                self.vector_store.similarity_search(cue, k=PROMPT_CHUNKS_PER_CUE)
+                for cue in PROMPT_FIELD_CUES
+            ]
+        except Exception as e:
+            logger.warning(f"Chunk retrieval for prompt failed, using report prefix: {str(e)}")
+            return raw_text[:PROMPT_CHAR_BUDGET]
+        
+        # Best match of every cue first, then second best, and so on
+        selected = {}
+        remaining = PROMPT_CHAR_BUDGET
+        for rank in range(PROMPT_CHUNKS_PER_CUE):
+            for docs in results:
+                if remaining <= 0:
+                    break
+                if rank >= len(docs) or docs[rank].page_content in selected:
+                    continue
+                chunk = docs[rank].page_content[:remaining]
+                selected[docs[rank].page_content] = chunk
+                remaining -= len(chunk)
+        
+        ordered = sorted(selected, key=raw_text.find)
+        return "\n...\n".join(selected[chunk] for chunk in ordered)
+    
+    def extract_medical_info(self, raw_text: str) -> MedicalInfo:
         """
         Extract structured medical information using Gemini
         
@@ -79,7 +380,7 @@ class RAGProcessor:
             raw_text: Raw text from PDF
             
         Returns:
-            Dictionary with extracted medical information
+            MedicalInfo with extracted fields (all None if extraction fails)
         """
         extraction_prompt = f"""
         Analyze the following medical report and extract information in JSON format.
@@ -100,31 +401,27 @@ class RAGProcessor:
         - test_results: Array of {{test_name, test_value, unit, normal_range, status}}
         
         Medical Report:
-        {raw_text[:15000]}
+        {self._prompt_text(raw_text)}
         """
         
         try:
-            model = ChatGoogleGenerativeAI(
-                model="models/gemini-2.5-flash",
-                temperature=0.1
-            )
+            model = get_chat_model(0.1)
             
             response = model.invoke(extraction_prompt)
             response_text = response.content
             
             # Parse JSON from response
-            if "```json" in response_text:
-                response_text = response_text.split("```json").split("```")
-            elif "```" in response_text:
-                response_text = response_text.split("```").split("```")
+            match = JSON_OBJECT_RE.search(response_text)
+            if not match:
+                raise ValueError("No JSON object in model response")
             
-            extracted_info = json.loads(response_text.strip())
+            extracted_info = MedicalInfo.from_dict(orjson.loads(match.group(0)))
             logger.info(f"Successfully extracted medical information")
             return extracted_info
             
         except Exception as e:
             logger.error(f"Error extracting medical info: {str(e)}")
-            return {}
+            return MedicalInfo()
     
     def generate_summary(self, raw_text: str) -> str:
         """
@@ -149,14 +446,11 @@ class RAGProcessor:
         Keep it concise (200-400 words).
         
         Report:
-        {raw_text[:15000]}
+        {self._prompt_text(raw_text)}
         """
         
         try:
-            model = ChatGoogleGenerativeAI(
-                model="models/gemini-2.5-flash",
-                temperature=0.3
-            )
+            model = get_chat_model(0.3)
             
             response = model.invoke(summary_prompt)
             summary = response.content
@@ -168,34 +462,28 @@ class RAGProcessor:
             logger.error(f"Error generating summary: {str(e)}")
             return "Summary generation failed"
     
-    def get_conversational_chain(self):
-        """Create conversational chain for Q&A"""
-        prompt_template = """
-        Answer the question in detail from the provided context.
-        If answer not in context, say "Answer not available in the context".
-        Don't provide wrong information.
-        
-        Context:
-        {context}
-        
-        Question:
-        {question}
-        
-        Answer:
+    def _search(self, vector_store: FAISS, faiss_path: str, question: str, k: int) -> list:
         """
+        Top-k chunks for a question
         
-        model = ChatGoogleGenerativeAI(
-            model="models/gemini-2.5-flash",
-            temperature=0.3
-        )
+        The SQ8 index only shortlists RERANK_OVERFETCH * k candidates; their
+        final order comes from exact float32 scores against the saved
+        vectors. Indexes without saved vectors are searched directly.
+        """
+        rerank_path = os.path.join(faiss_path, RERANK_VECTORS_FILE)
+        if not os.path.exists(rerank_path):
+            return vector_store.similarity_search(question, k=k)
         
-        prompt = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
-        )
+        query = np.asarray(self.embeddings.embed_query(question), dtype="float32")
+        _, ids = vector_store.index.search(query[None, :], k * RERANK_OVERFETCH)
+        ids = ids[0][ids[0] >= 0]
         
-        chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
-        return chain
+        vectors = np.load(rerank_path, mmap_mode="r")
+        best = ids[np.argsort(-(vectors[ids] @ query))[:k]]
+        return [
+            vector_store.docstore.search(vector_store.index_to_docstore_id[i])
+            for i in best
+        ]
     
     def answer_question(self, question: str, faiss_path: str) -> str:
         """
@@ -213,17 +501,16 @@ class RAGProcessor:
             vector_store = self.load_vector_store(faiss_path)
             
             # Search for relevant documents
-            docs = vector_store.similarity_search(question, k=5)
+            docs = self._search(vector_store, faiss_path, question, k=5)
             
-            # Generate answer
-            chain = self.get_conversational_chain()
-            response = chain(
-                {"input_documents": docs, "question": question},
-                return_only_outputs=True
+            # Generate answer: "stuff" the chunks into the prompt directly
+            context = "\n\n".join(doc.page_content for doc in docs)
+            response = get_chat_model(0.3).invoke(
+                QA_PROMPT_TEMPLATE.format(context=context, question=question)
             )
             
             logger.info(f"Question answered successfully")
-            return response["output_text"]
+            return response.content
             
         except Exception as e:
             logger.error(f"Error answering question: {str(e)}")
@@ -8,6 +8,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
 import os
+import asyncio
+import hashlib
 from dotenv import load_dotenv
 import tempfile
 
@@ -36,6 +38,12 @@ pdf_processor = PDFProcessor()
 rag_engine = RAGEngine()
 medical_extractor = MedicalExtractor()
 
+# Cap on reports analysed at once by the bulk endpoint (two Gemini calls each)
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', 4))
+
+# Uploads are copied to disk in 1 MB pieces instead of being read whole
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 
 # Request/Response Models
 class ChatRequest(BaseModel):
@@ -72,52 +80,81 @@ async def health_check():
     }
 
 
-@app.post("/api/rag/process-report", response_model=ReportAnalysis)
-async def process_report(
-    file: UploadFile = File(...),
-    patient_id: Optional[str] = Form(None)
-):
+def meta_path(report_id: str) -> str:
+    """Saved ReportAnalysis for a processed report, next to its FAISS index"""
+    return f"faiss_indexes/{report_id}/meta.json"
+
+
+def load_analysis(report_id: str) -> Optional[ReportAnalysis]:
+    try:
+        with open(meta_path(report_id), 'rb') as f:
+            return ReportAnalysis.model_validate_json(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def save_analysis(analysis: ReportAnalysis):
+    """Write meta.json atomically so a concurrent upload never reads half of it"""
+    path = meta_path(analysis.report_id)
+    with open(f"{path}.tmp", 'w') as f:
+        f.write(analysis.model_dump_json())
+    os.replace(f"{path}.tmp", path)
+
+
+def index_report(raw_text: str, report_id: str) -> str:
+    """Chunk and embed report text into its FAISS index (CPU-bound)"""
+    text_chunks = pdf_processor.create_chunks(raw_text)
+    faiss_path = rag_engine.create_vector_store(text_chunks, report_id)
+    print(f"Created FAISS index: {faiss_path}")
+    return faiss_path
+
+
+async def analyze_upload(file: UploadFile, patient_id: Optional[str]) -> ReportAnalysis:
     """
     Process uploaded medical report PDF
     1. Extract text from PDF
-    2. Create FAISS vector store
-    3. Extract medical information using Gemini
-    4. Generate summary
+    2. Concurrently: create FAISS vector store (worker thread), extract
+       medical information and generate summary (Gemini)
+    
+    Reports are identified by a hash of the PDF bytes, so re-uploading the
+    same file returns the saved analysis without reprocessing it.
     """
     try:
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-        
         print(f"Processing file: {file.filename}")
         
-        # Step 1: Extract text
-        raw_text, _ = pdf_processor.extract_text(tmp_path)
+        # Step 1: Stream the upload to a temporary file and extract text
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
+            tmp_path = tmp.name
+        try:
+            digest = hashlib.sha256()
+            with open(tmp_path, 'wb') as out:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    out.write(chunk)
+            
+            report_id = f"RPT_{patient_id}_{digest.hexdigest()[:16]}"
+            analysis = load_analysis(report_id)
+            if analysis:
+                print(f"Already processed as {report_id}")
+                return analysis
+            
+            raw_text, _ = await asyncio.to_thread(pdf_processor.extract_text, tmp_path)
+        finally:
+            os.unlink(tmp_path)
         
         if not raw_text or len(raw_text.strip()) < 50:
             raise HTTPException(400, "No readable text in PDF")
         
         print(f"Extracted {len(raw_text)} characters")
         
-        # Step 2: Create vector store
-        text_chunks = pdf_processor.create_chunks(raw_text)
-        report_id = f"RPT_{patient_id}_{file.filename.replace('.pdf', '')}"
-        faiss_path = rag_engine.create_vector_store(text_chunks, report_id)
-        
-        print(f"Created FAISS index: {faiss_path}")
-        
-        # Step 3: Extract medical info
-        extracted_info = medical_extractor.extract_info(raw_text)
-        
-        # Step 4: Generate summary
-        summary = medical_extractor.generate_summary(raw_text)
-        
-        # Clean up temp file
-        os.unlink(tmp_path)
+        # Step 2: Index, extract medical info and generate summary in parallel
+        faiss_path, extracted_info, summary = await asyncio.gather(
+            asyncio.to_thread(index_report, raw_text, report_id),
+            medical_extractor.aextract_info(raw_text),
+            medical_extractor.agenerate_summary(raw_text)
+        )
         
-        return ReportAnalysis(
+        analysis = ReportAnalysis(
             report_id=report_id,
             patient_name=extracted_info.get('patient_name'),
             patient_age=extracted_info.get('patient_age'),
@@ -132,6 +169,12 @@ async def process_report(
             faiss_path=faiss_path
         )
         
+        # Only complete results are reused; failed Gemini calls are retried next upload
+        if extracted_info and not summary.startswith("Summary generation failed"):
+            save_analysis(analysis)
+        
+        return analysis
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -141,20 +184,49 @@ async def process_report(
         raise HTTPException(500, f"Processing failed: {str(e)}")
 
 
+@app.post("/api/rag/process-report", response_model=ReportAnalysis)
+async def process_report(
+    file: UploadFile = File(...),
+    patient_id: Optional[str] = Form(None)
+):
+    """
+    Process uploaded medical report PDF
+    """
+    return await analyze_upload(file, patient_id)
+
+
+@app.post("/api/rag/process-reports", response_model=List[ReportAnalysis])
+async def process_reports(
+    files: List[UploadFile] = File(...),
+    patient_id: Optional[str] = Form(None)
+):
+    """
+    Process several medical report PDFs at once
+    At most LLM_CONCURRENCY reports talk to Gemini at the same time
+    """
+    semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    
+    async def bounded(file: UploadFile) -> ReportAnalysis:
+        async with semaphore:
+            return await analyze_upload(file, patient_id)
+    
+    return await asyncio.gather(*(bounded(file) for file in files))
+
+
 @app.post("/api/rag/chat", response_model=ChatResponse)
 async def chat_with_report(request: ChatRequest):
     """
     Chat with a processed report using RAG
     """
     try:
-        answer = rag_engine.query(
+        answer, confidence = rag_engine.query(
             question=request.question,
             faiss_path=f"faiss_indexes/{request.report_id}"
         )
         
         return ChatResponse(
             answer=answer,
-            confidence=0.85  # You can calculate this based on similarity scores
+            confidence=round(confidence, 4)
         )
         
     except Exception as e:
@@ -0,0 +1,68 @@
+"""MiniLM embeddings on ONNX Runtime (int8, AVX512-VNNI)"""
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from typing import List
+import numpy as np
+import onnxruntime
+from cachetools import LRUCache
+from langchain_core.embeddings import Embeddings
+from sentence_transformers import SentenceTransformer
+
+# Vectors of recently embedded texts; report boilerplate repeats across uploads
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 100_000))
+
+# ONNX Runtime intra-op threads; 0 uses every physical core
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))
+
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(self):
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = EMBEDDING_THREADS
+        self.model = SentenceTransformer(
+            "sentence-transformers/all-MiniLM-L6-v2",
+            backend="onnx",
+            model_kwargs={
+                "file_name": os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx"),
+                "session_options": session_options
+            }
+        )
+        self._cache = LRUCache(maxsize=EMBEDDING_CACHE_SIZE)
+        self._cache_lock = threading.Lock()
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, running the model only on ones not already cached"""
+        keys = [hashlib.blake2b(text.encode(), digest_size=16).digest() for text in texts]
+        with self._cache_lock:
+            vectors = [self._cache.get(key) for key in keys]
+        
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            fresh = self.model.encode(
+                [texts[i] for i in misses],
+                batch_size=64,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+            with self._cache_lock:
+                for i, vector in zip(misses, fresh):
+                    vectors[i] = self._cache[keys[i]] = vector.copy()
+        
+        if not vectors:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype="float32")
+        return np.vstack(vectors)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> OnnxEmbeddings:
+    """Shared embedding model; loaded once per process"""
+    return OnnxEmbeddings()
@@ -0,0 +1,17 @@
+"""Shared Gemini clients"""
+from functools import lru_cache
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(temperature: float) -> ChatGoogleGenerativeAI:
+    """
+    One client per temperature for the whole process
+    
+    Each client owns a gRPC channel; sharing it lets concurrent requests
+    multiplex over one HTTP/2 connection instead of opening their own.
+    """
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash-exp",
+        temperature=temperature
+    )
\ No newline at end of file
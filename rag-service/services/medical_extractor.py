@@ -1,59 +1,52 @@
 """Medical Information Extraction using Gemini"""
-import json
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from services.gemini import get_chat_model
+
+
+class TestResult(BaseModel):
+    test_name: Optional[str] = None
+    test_value: Optional[str] = None
+    unit: Optional[str] = None
+    normal_range: Optional[str] = None
+    status: Optional[str] = Field(None, description="Normal/High/Low/Abnormal")
+
+
+class MedicalReport(BaseModel):
+    """Structured fields extracted from a medical report; null when missing"""
+    patient_name: Optional[str] = None
+    patient_age: Optional[int] = None
+    patient_gender: Optional[str] = Field(None, description="Male/Female/Other")
+    patient_id: Optional[str] = None
+    report_date: Optional[str] = Field(None, description="YYYY-MM-DD")
+    report_type: Optional[str] = Field(None, description="Blood Test/X-Ray/MRI/CT Scan/General Checkup/etc")
+    hospital_name: Optional[str] = None
+    doctor_name: Optional[str] = None
+    diagnosis: Optional[str] = Field(None, description="Main findings")
+    key_findings: Optional[str] = Field(None, description="Important observations")
+    recommendations: Optional[str] = Field(None, description="Doctor's advice")
+    test_results: List[TestResult] = Field(default_factory=list)
 
 
 class MedicalExtractor:
     def __init__(self):
-        self.model = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-exp",
-            temperature=0.1
-        )
+        self.model = get_chat_model(0.1)
+        # Gemini fills the schema itself, so replies need no JSON cleanup
+        self.extraction_model = self.model.with_structured_output(MedicalReport)
     
-    def extract_info(self, raw_text: str) -> dict:
-        """Extract structured medical information"""
-        prompt = f"""
-        Analyze this medical report and extract information in valid JSON format.
+    @staticmethod
+    def _extraction_prompt(raw_text: str) -> str:
+        return f"""
+        Analyze this medical report and extract its patient, report and test result details.
         Use null for missing fields.
         
-        Extract these fields:
-        - patient_name (string)
-        - patient_age (number)
-        - patient_gender (Male/Female/Other)
-        - patient_id (string)
-        - report_date (YYYY-MM-DD format)
-        - report_type (Blood Test/X-Ray/MRI/CT Scan/General Checkup/etc)
-        - hospital_name (string)
-        - doctor_name (string)
-        - diagnosis (string - main findings)
-        - key_findings (string - important observations)
-        - recommendations (string - doctor's advice)
-        - test_results (array of objects with: test_name, test_value, unit, normal_range, status)
-        
         Medical Report:
         {raw_text[:12000]}
-        
-        Return ONLY valid JSON, no markdown, no explanation.
         """
-        
-        try:
-            response = self.model.invoke(prompt)
-            response_text = response.content
-            
-            # Clean JSON
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0]
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0]
-            
-            return json.loads(response_text.strip())
-        except Exception as e:
-            print(f"Extraction error: {e}")
-            return {}
     
-    def generate_summary(self, raw_text: str) -> str:
-        """Generate medical summary"""
-        prompt = f"""
+    @staticmethod
+    def _summary_prompt(raw_text: str) -> str:
+        return f"""
         Generate a professional medical summary (200-350 words) covering:
         1. Patient Overview
         2. Key Test Results
@@ -66,9 +59,41 @@ class MedicalExtractor:
         
         Summary:
         """
-        
+    
+    @staticmethod
+    def _as_dict(report: Optional[MedicalReport]) -> dict:
+        return report.model_dump() if report else {}
+    
+    def extract_info(self, raw_text: str) -> dict:
+        """Extract structured medical information"""
+        try:
+            report = self.extraction_model.invoke(self._extraction_prompt(raw_text))
+            return self._as_dict(report)
+        except Exception as e:
+            print(f"Extraction error: {e}")
+            return {}
+    
+    def generate_summary(self, raw_text: str) -> str:
+        """Generate medical summary"""
+        try:
+            response = self.model.invoke(self._summary_prompt(raw_text))
+            return response.content
+        except Exception as e:
+            return f"Summary generation failed: {e}"
+    
+    async def aextract_info(self, raw_text: str) -> dict:
+        """Async extract_info; awaits Gemini without blocking the event loop"""
+        try:
+            report = await self.extraction_model.ainvoke(self._extraction_prompt(raw_text))
+            return self._as_dict(report)
+        except Exception as e:
+            print(f"Extraction error: {e}")
+            return {}
+    
+    async def agenerate_summary(self, raw_text: str) -> str:
+        """Async generate_summary; awaits Gemini without blocking the event loop"""
         try:
-            response = self.model.invoke(prompt)
+            response = await self.model.ainvoke(self._summary_prompt(raw_text))
             return response.content
         except Exception as e:
             return f"Summary generation failed: {e}"
\ No newline at end of file
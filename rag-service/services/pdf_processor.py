@@ -1,31 +1,78 @@
 """PDF Processing Service"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import fitz
 from PyPDF2 import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from typing import Tuple, List
 
+# PDFs with at least this many pages are extracted in page ranges across
+# worker processes (MuPDF documents cannot be shared between threads)
+PARALLEL_MIN_PAGES = 16
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """Create the extraction process pool on first use"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pdf_pool
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Extract pages [start, stop); runs in a worker process with its own document"""
+    with fitz.open(pdf_path) as doc:
+        return [doc[page_num].get_text() for page_num in range(start, stop)]
+
+
+def _extract_pages(pdf_path: str) -> List[str]:
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+        if page_count < PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+            return [page.get_text() for page in doc]
+    
+    step = -(-page_count // PDF_WORKERS)
+    futures = [
+        get_pdf_pool().submit(_extract_page_range, pdf_path, start, min(start + step, page_count))
+        for start in range(0, page_count, step)
+    ]
+    return [text for future in futures for text in future.result()]
+
+
+@lru_cache(maxsize=8)
+def get_splitter(chunk_size: int, overlap: int) -> RecursiveCharacterTextSplitter:
+    """Build a splitter once per (chunk_size, overlap) and reuse it"""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=overlap
+    )
+
 
 class PDFProcessor:
     def extract_text(self, pdf_path: str) -> Tuple[str, List[str]]:
-        """Extract text from PDF"""
-        text = ""
+        """Extract text from PDF with PyMuPDF, falling back to PyPDF2"""
         file_name = pdf_path.split("/")[-1].split("\\")[-1]
         
         try:
-            pdf_reader = PdfReader(pdf_path)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-            
-            return text, [file_name]
+            pages = _extract_pages(pdf_path)
         except Exception as e:
-            raise Exception(f"PDF extraction failed: {e}")
+            print(f"PyMuPDF could not read PDF, falling back to PyPDF2: {e}")
+            try:
+                pages = [page.extract_text() for page in PdfReader(pdf_path).pages]
+            except Exception as e:
+                raise Exception(f"PDF extraction failed: {e}")
+        
+        text = "".join(page_text + "\n" for page_text in pages if page_text)
+        return text, [file_name]
     
     def create_chunks(self, text: str, chunk_size: int = 10000, 
                      overlap: int = 1000) -> List[str]:
         """Split text into chunks"""
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=overlap
-        )
-        return splitter.split_text(text)
\ No newline at end of file
+        return get_splitter(chunk_size, overlap).split_text(text)
\ No newline at end of file
@@ -1,17 +1,80 @@
 """RAG Engine - FAISS + LangChain"""
 import os
-from langchain_huggingface import HuggingFaceEmbeddings
+import pickle
+from functools import lru_cache
+from typing import List, Tuple
+import faiss
+import numpy as np
+from services.embeddings import get_embeddings
+from services.gemini import get_chat_model
 from langchain_community.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
-from langchain_core.prompts import PromptTemplate
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+
+# IVF+PQ needs enough vectors to train 64 coarse centroids and 256-entry codebooks;
+# smaller (per-report) corpora use HNSW, which needs no training
+IVF_PQ_FACTORY = "IVF64,PQ32x8"
+IVF_PQ_MIN_VECTORS = 64 * 39
+IVF_NPROBE = 8
+HNSW_FACTORY = "HNSW32"
+HNSW_SQ8_FACTORY = "HNSW32_SQ8"
+
+# 8-bit scalar quantization of HNSW vectors; set SQ8_ENABLED=0 to compare recall
+SQ8_ENABLED = os.getenv("SQ8_ENABLED", "1") != "0"
+
+# Quantized indexes shortlist RERANK_OVERFETCH * k candidates, reranked against
+# the float32 vectors saved next to the index
+RERANK_VECTORS_FILE = "vectors.npy"
+RERANK_OVERFETCH = 4
+
+# Questions whose best chunk scores below this cosine similarity are answered
+# as out of scope without calling Gemini
+MIN_CONFIDENCE = float(os.getenv("MIN_CONFIDENCE", 0.15))
+NOT_IN_REPORT = "This information is not available in the report."
+
+
+def build_index(vectors) -> faiss.Index:
+    """Inner-product ANN index over normalized embeddings"""
+    if len(vectors) >= IVF_PQ_MIN_VECTORS:
+        index = faiss.index_factory(vectors.shape[1], IVF_PQ_FACTORY, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+    elif SQ8_ENABLED:
+        index = faiss.index_factory(vectors.shape[1], HNSW_SQ8_FACTORY, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    else:
+        index = faiss.index_factory(vectors.shape[1], HNSW_FACTORY, faiss.METRIC_INNER_PRODUCT)
+    return index
+
+
+@lru_cache(maxsize=64)
+def _load(faiss_path: str, mtime: float) -> FAISS:
+    """Loaded store per index; mtime in the key drops it once the report is reprocessed"""
+    # Same files FAISS.save_local writes; the metric picks the distance strategy
+    index = faiss.read_index(f"{faiss_path}/index.faiss")
+    with open(f"{faiss_path}/index.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    
+    # Indexes saved before the switch to inner product are L2 flat
+    distance_strategy = (
+        DistanceStrategy.MAX_INNER_PRODUCT
+        if index.metric_type == faiss.METRIC_INNER_PRODUCT
+        else DistanceStrategy.EUCLIDEAN_DISTANCE
+    )
+    
+    return FAISS(
+        embedding_function=get_embeddings(),
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+        distance_strategy=distance_strategy
+    )
 
 
 class RAGEngine:
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        self.embeddings = get_embeddings()
         
         self.prompt_template = """
         You are a medical AI assistant. Answer the question based on the provided medical report context.
@@ -22,10 +85,19 @@ class RAGEngine:
         
         Answer (be precise and medical):
         """
+        self.model = get_chat_model(0.3)
     
     def create_vector_store(self, text_chunks: list, report_id: str) -> str:
         """Create FAISS vector store"""
-        vector_store = FAISS.from_texts(text_chunks, embedding=self.embeddings)
+        vectors = self.embeddings.encode(text_chunks)
+        vector_store = FAISS(
+            embedding_function=self.embeddings,
+            index=build_index(vectors),
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+        vector_store.add_embeddings(zip(text_chunks, vectors))
         
         # Save with report ID
         faiss_dir = "faiss_indexes"
@@ -34,48 +106,63 @@ class RAGEngine:
         faiss_path = f"{faiss_dir}/{report_id}"
         os.makedirs(faiss_path, exist_ok=True)
         vector_store.save_local(faiss_path)
+        if len(vectors) >= IVF_PQ_MIN_VECTORS or SQ8_ENABLED:
+            np.save(f"{faiss_path}/{RERANK_VECTORS_FILE}", vectors)
         
         return faiss_path
     
-    def query(self, question: str, faiss_path: str) -> str:
-        """Query using RAG"""
+    def _search(self, vector_store: FAISS, faiss_path: str, question: str, k: int) -> List[Tuple]:
+        """
+        Top-k (chunk, cosine similarity) pairs, best first
+        
+        Quantized indexes are reranked with exact float32 scores.
+        """
+        rerank_path = f"{faiss_path}/{RERANK_VECTORS_FILE}"
+        if not os.path.exists(rerank_path):
+            hits = vector_store.similarity_search_with_score(question, k=k)
+            if vector_store.distance_strategy == DistanceStrategy.EUCLIDEAN_DISTANCE:
+                # Squared L2 between unit vectors is 2 - 2 * cosine
+                hits = [(doc, 1 - distance / 2) for doc, distance in hits]
+            return hits
+        
+        query = self.embeddings.encode([question])[0]
+        _, ids = vector_store.index.search(query[None, :], k * RERANK_OVERFETCH)
+        ids = ids[0][ids[0] >= 0]
+        
+        vectors = np.load(rerank_path, mmap_mode="r")
+        scores = vectors[ids] @ query
+        order = np.argsort(-scores)[:k]
+        return [
+            (vector_store.docstore.search(vector_store.index_to_docstore_id[ids[i]]), float(scores[i]))
+            for i in order
+        ]
+    
+    def query(self, question: str, faiss_path: str) -> Tuple[str, float]:
+        """Query using RAG; returns the answer and the best chunk's similarity"""
         try:
             # Load vector store
             if not os.path.exists(faiss_path):
-                return "Error: Report index not found. Please process the report first."
+                return "Error: Report index not found. Please process the report first.", 0.0
             
-            vector_store = FAISS.load_local(
-                faiss_path, 
-                self.embeddings, 
-                allow_dangerous_deserialization=True
-            )
+            vector_store = _load(faiss_path, os.path.getmtime(f"{faiss_path}/index.faiss"))
             
             # Search similar documents
-            docs = vector_store.similarity_search(question, k=3)
-            
-            if not docs:
-                return "No relevant information found in the report."
+            hits = self._search(vector_store, faiss_path, question, k=3)
             
-            # Create Q&A chain
-            model = ChatGoogleGenerativeAI(
-                model="gemini-2.0-flash-exp",
-                temperature=0.3
-            )
-            
-            prompt = PromptTemplate(
-                template=self.prompt_template, 
-                input_variables=["context", "question"]
-            )
+            if not hits:
+                return "No relevant information found in the report.", 0.0
             
-            chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
+            confidence = max(0.0, max(score for _, score in hits))
+            if confidence < MIN_CONFIDENCE:
+                return NOT_IN_REPORT, confidence
             
             # Get answer
-            response = chain(
-                {"input_documents": docs, "question": question},
-                return_only_outputs=True
+            context = "\n\n".join(doc.page_content for doc, _ in hits)
+            response = self.model.invoke(
+                self.prompt_template.format(context=context, question=question)
             )
             
-            return response["output_text"]
+            return response.content, confidence
             
         except Exception as e:
-            return f"Error processing question: {str(e)}"
\ No newline at end of file
+            return f"Error processing question: {str(e)}", 0.0
\ No newline at end of file